@@ -0,0 +1,103 @@
+import copy
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class ResultCache:
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.__max_entries = int(max_entries)
+        self.__ttl = float(ttl_seconds) if ttl_seconds else None
+        self.__entries = OrderedDict()
+        self.__keys = {}
+        self.__generations = {}
+        self.__collections = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, collection: str):
+        return self.__generations.get(collection, 0)
+
+    def get(self, collection: str, key):
+        entry = self.__entries.get((collection, key))
+        if entry is not None and entry[1] and entry[1] <= time.monotonic():
+            self.__remove((collection, key))
+            entry = None
+
+        counters = self.__collections.setdefault(collection, {"hits": 0, "misses": 0})
+        if entry is None:
+            self.misses += 1
+            counters["misses"] += 1
+            return None
+
+        self.__entries.move_to_end((collection, key))
+        self.hits += 1
+        counters["hits"] += 1
+        # Callers mutate returned results, every hit gets its own copy
+        return copy.deepcopy(entry[0])
+
+    def put(self, collection: str, key, value, generation: int):
+        # A write to the collection since the read started may not be in the value, keep it out of the cache
+        if value is None or generation != self.generation(collection):
+            return
+
+        if (collection, key) in self.__entries:
+            self.__remove((collection, key))
+        expires_at = time.monotonic() + self.__ttl if self.__ttl else None
+        self.__entries[(collection, key)] = (copy.deepcopy(value), expires_at)
+        self.__keys.setdefault(collection, set()).add(key)
+
+        while len(self.__entries) > self.__max_entries:
+            self.__remove(next(iter(self.__entries)))
+            self.evictions += 1
+
+    def invalidate(self, collection: Optional[str] = None):
+        collections = [collection] if collection is not None else list(set(self.__keys) | set(self.__generations))
+        for collection in collections:
+            self.__generations[collection] = self.generation(collection) + 1
+            for key in self.__keys.pop(collection, set()):
+                del self.__entries[(collection, key)]
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidate()
+        self.__entries.clear()
+        self.__keys.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.__entries),
+            "max_entries": self.__max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "collections": {
+                collection: {**counters, "hit_rate": counters["hits"] / (counters["hits"] + counters["misses"]) if counters["hits"] + counters["misses"] else 0.0}
+                for collection, counters in self.__collections.items()
+            }
+        }
+
+    def __remove(self, entry_key):
+        del self.__entries[entry_key]
+        collection, key = entry_key
+        self.__keys[collection].discard(key)
+        if not self.__keys[collection]:
+            del self.__keys[collection]
+
+    def __len__(self):
+        return len(self.__entries)
+
+def freeze(value):
+    # Hashable form of call arguments, dictionaries and lists become tuples
+    if isinstance(value, dict):
+        return ("dict", tuple((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(freeze(v) for v in value))
+    return value
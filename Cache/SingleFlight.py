@@ -0,0 +1,33 @@
+import copy
+import asyncio
+
+class SingleFlight:
+
+    def __init__(self):
+        self.__calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def run(self, key, call):
+        # Identical calls in flight share one task, started by the first caller
+        entry = self.__calls.get(key)
+        if entry is None:
+            self.calls += 1
+            entry = [asyncio.ensure_future(call()), 0]
+            self.__calls[key] = entry
+            entry[0].add_done_callback(lambda _: self.__calls.pop(key, None))
+        else:
+            self.shared += 1
+        entry[1] += 1
+
+        # A cancelled caller leaves the shared task running for the others
+        result = await asyncio.shield(entry[0])
+        # The entry is gone before any caller resumes, so the count of callers is final here
+        return copy.deepcopy(result) if entry[1] > 1 else result
+
+    def stats(self):
+        return {
+            "in_flight": len(self.__calls),
+            "calls": self.calls,
+            "shared": self.shared
+        }
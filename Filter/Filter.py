@@ -0,0 +1,233 @@
+import re
+import math
+import functools
+from typing import List, Any
+
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+MILVUS_OPERATORS = {"==": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=", "in": "in", "not in": "not in", "like": "like"}
+MONGO_OPERATORS = {"!=": "$ne", "<": "$lt", "<=": "$lte", ">": "$gt", ">=": "$gte", "in": "$in", "not in": "$nin"}
+
+class UnindexedFieldWarning(UserWarning):
+    pass
+
+class Expression:
+    # Immutable tree of tuples, ("cmp", field, operator, value) | ("and", ...) | ("or", ...) | ("not", expression)
+    # Values are (type name, value) pairs so that 1, 1.0 and True never share a compiled expression
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.__milvus = None
+
+    def __and__(self, other: "Expression"):
+        return And(self, other)
+
+    def __or__(self, other: "Expression"):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Expression) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return "Expression({})".format(self.to_milvus())
+
+    def to_milvus(self):
+        if self.__milvus is None:
+            self.__milvus = compile_milvus(self.key)
+        return self.__milvus
+
+    def to_mongo(self):
+        return compile_mongo(self.key)
+
+    def fields(self):
+        return fields_of(self.key)
+
+    def pinned(self, field: str):
+        # Values of `field` every matching row must have, None if the expression does not pin the field
+        values = pinned_of(self.key, field)
+        return [value for _, value in sorted(values)] if values is not None else None
+
+    def folded(self):
+        # Milvus rejects an empty "in" / "not in" list, True or False if such lists decide the whole expression
+        key = fold(self.key)
+        return key if isinstance(key, bool) else Expression(key)
+
+    def batches(self, size: int):
+        # Split the largest "in" list of the top-level conjunction, each part selects a disjoint subset of rows
+        conditions = list(self.key[1:]) if self.key[0] == "and" else [self.key]
+        candidates = [i for i, c in enumerate(conditions) if c[0] == "cmp" and c[2] == "in" and len(c[3]) > size]
+        if not candidates:
+            return [self]
+
+        i = max(candidates, key=lambda i: len(conditions[i][3]))
+        _, field, operator, values = conditions[i]
+        # A value repeated across parts would return its rows once per part
+        values = tuple(dict.fromkeys(values))
+        return [
+            Expression(("and", *conditions[:i], ("cmp", field, operator, values[j:j + size]), *conditions[i + 1:]) if len(conditions) > 1 else ("cmp", field, operator, values[j:j + size]))
+            for j in range(0, len(values), size)
+        ]
+
+class Field:
+
+    def __init__(self, name: str):
+        if not isinstance(name, str) or not FIELD_NAME.match(name):
+            raise ValueError("To filter data, field name must be an identifier.")
+        self.name = name
+
+    def __eq__(self, value):
+        return self.__compare("==", value)
+
+    def __ne__(self, value):
+        return self.__compare("!=", value)
+
+    def __lt__(self, value):
+        return self.__compare("<", value)
+
+    def __le__(self, value):
+        return self.__compare("<=", value)
+
+    def __gt__(self, value):
+        return self.__compare(">", value)
+
+    def __ge__(self, value):
+        return self.__compare(">=", value)
+
+    def isin(self, values: List[Any]):
+        return Expression(("cmp", self.name, "in", tuple(literal(value) for value in values)))
+
+    def notin(self, values: List[Any]):
+        return Expression(("cmp", self.name, "not in", tuple(literal(value) for value in values)))
+
+    def like(self, pattern: str):
+        # "%" matches any sequence, "_" matches one character
+        if not isinstance(pattern, str):
+            raise ValueError("To filter data with like, pattern type must be string.")
+        return Expression(("cmp", self.name, "like", literal(pattern)))
+
+    def __compare(self, operator: str, value):
+        return Expression(("cmp", self.name, operator, literal(value)))
+
+    __hash__ = None
+
+def And(*expressions: Expression):
+    return Expression(("and", *flatten("and", expressions)))
+
+def Or(*expressions: Expression):
+    return Expression(("or", *flatten("or", expressions)))
+
+def Not(expression: Expression):
+    return Expression(("not", expression.key))
+
+def flatten(kind: str, expressions):
+    keys = []
+    for expression in expressions:
+        if not isinstance(expression, Expression):
+            raise ValueError("To combine filters, each filter must be an expression.")
+        keys.extend(expression.key[1:] if expression.key[0] == kind else [expression.key])
+    if not keys:
+        raise ValueError("To combine filters, at least one filter must be given.")
+    return keys
+
+def literal(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError("To filter data, number value must be finite.")
+    if not isinstance(value, (str, bool, int, float)):
+        raise ValueError("To filter data, value type must be string, boolean, integer or float.")
+    return (type(value).__name__, value)
+
+def milvus_literal(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        # Milvus decodes only \\ and \" inside double quotes, any other character is compared as written
+        if "\n" in value or "\r" in value:
+            raise ValueError("To filter data on Milvus, string value must not contain line breaks.")
+        return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+    return repr(value)
+
+@functools.lru_cache(maxsize=4096)
+def compile_milvus(key: tuple):
+    kind = key[0]
+    if kind == "cmp":
+        _, field, operator, value = key
+        if operator in ("in", "not in"):
+            return "{} {} [{}]".format(field, operator, ", ".join(milvus_literal(v) for _, v in value))
+        return "{} {} {}".format(field, MILVUS_OPERATORS[operator], milvus_literal(value[1]))
+    if kind == "not":
+        return "not ({})".format(compile_milvus(key[1]))
+    if len(key) == 2:
+        return compile_milvus(key[1])
+    return " {} ".format(kind).join(
+        compile_milvus(child) if child[0] == "cmp" else "({})".format(compile_milvus(child))
+        for child in key[1:]
+    )
+
+def compile_mongo(key: tuple):
+    kind = key[0]
+    if kind == "cmp":
+        _, field, operator, value = key
+        if operator in ("in", "not in"):
+            return {field: {MONGO_OPERATORS[operator]: [v for _, v in value]}}
+        if operator == "==":
+            return {field: value[1]}
+        if operator == "like":
+            return {field: {"$regex": like_pattern(value[1])}}
+        return {field: {MONGO_OPERATORS[operator]: value[1]}}
+    if kind == "not":
+        return {"$nor": [compile_mongo(key[1])]}
+    if len(key) == 2:
+        return compile_mongo(key[1])
+    return {"$" + kind: [compile_mongo(child) for child in key[1:]]}
+
+def like_pattern(pattern: str):
+    return "^" + "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern) + "$"
+
+def fields_of(key: tuple):
+    if key[0] == "cmp":
+        return {key[1]}
+    if key[0] == "not":
+        return fields_of(key[1])
+    return set().union(*(fields_of(child) for child in key[1:]))
+
+def fold(key: tuple):
+    kind = key[0]
+    if kind == "cmp":
+        return key[2] == "not in" if key[2] in ("in", "not in") and not key[3] else key
+    if kind == "not":
+        child = fold(key[1])
+        return not child if isinstance(child, bool) else ("not", child)
+
+    # True decides an "or", False decides an "and", the other constant drops out
+    decisive = kind == "or"
+    children = [fold(child) for child in key[1:]]
+    if any(child is decisive for child in children):
+        return decisive
+    children = [child for child in children if not isinstance(child, bool)]
+    return (kind, *children) if children else not decisive
+
+def pinned_of(key: tuple, field: str):
+    kind = key[0]
+    if kind == "cmp":
+        _, name, operator, value = key
+        if name != field:
+            return None
+        if operator == "==":
+            return {value}
+        if operator == "in":
+            return set(value)
+        return None
+    if kind == "and":
+        # A conjunction is pinned by any of its conditions, several pins intersect
+        pins = [pins for pins in (pinned_of(child, field) for child in key[1:]) if pins is not None]
+        return set.intersection(*pins) if pins else None
+    if kind == "or":
+        # A disjunction is pinned only if every branch is
+        pins = [pinned_of(child, field) for child in key[1:]]
+        return set().union(*pins) if all(p is not None for p in pins) else None
+    return None
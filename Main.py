@@ -6,6 +6,122 @@
 from Milvus.MilvusRepository import MilvusRepository
 from Milvus.MilvusField import *
 from Milvus.MilvusIndex import *
+from Milvus.Embedder import Embedder, EmbeddingBackend, HashingEmbeddingBackend
+from Milvus.MilvusExecutor import MilvusExecutor
+from Milvus.EmbeddingCache import EmbeddingCache, DiskEmbeddingCache, TieredEmbeddingCache
+from Milvus.SparseEncoder import SparseEncoder
+from Filter.Filter import Field, And, Or, Not
+from Cache.ResultCache import ResultCache
+from Cache.SingleFlight import SingleFlight
+
+#& Embedding Cache (Optional)
+"""
+    <EmbeddingCache> - In-Memory LRU Embedding Cache
+    max_bytes    [integer, optional(default=64MB)]   Least recently used vectors are evicted over this budget
+    ttl_seconds  [float,   optional(default=None)]   Cached vectors expire after this many seconds
+
+    `embedding_cache.stats()` returns entries, bytes, hits, misses, evictions and hit_rate.
+"""
+embedding_cache: EmbeddingCache = EmbeddingCache(max_bytes=64 * 1024 * 1024, ttl_seconds=3600)
+
+"""
+    <DiskEmbeddingCache> - Persistent Memory-Mapped Embedding Cache
+    path         [string,  required]                 Stored as `<path>.vectors` (float32 rows) and `<path>.index` (text hash per row)
+    dimension    [integer, required]
+    read_only    [boolean, optional(default=False)]  Only one writer per path, any number of read-only processes
+
+    <TieredEmbeddingCache> - Looks up tiers in order and copies hits into the earlier tiers
+"""
+embedding_cache = TieredEmbeddingCache(
+    EmbeddingCache(max_bytes=64 * 1024 * 1024),
+    DiskEmbeddingCache(path="/var/cache/dalmeng_pydb/embedding", dimension=756)
+)
+
+#& Embedder Instance (Optional)
+embedder: Embedder = Embedder(
+    embedding_ip="127.0.0.1",          # Required
+    embedding_port=7777,               # Required
+    coalesce=True,                     # Optional (Default=False) Gather concurrent single-text `encode` calls into one request
+    max_batch_size=64,                 # Optional (Default=64)    Send the gathered request once this many texts are waiting
+    max_wait_ms=5,                     # Optional (Default=5)     Send the gathered request after waiting this long
+    cache=embedding_cache,             # Optional (Default=None)  Only cache misses are sent to the embedding server
+    model="my-embedding-model",        # Optional (Default=None)  Part of the cache key
+    embedding_dimension=756,           # Optional (Default=None)  Part of the cache key
+    chunk_size=512,                    # Optional (Default=512)   Split large text lists into requests of this size
+    max_concurrent_chunks=4,           # Optional (Default=4)     Number of chunk requests in flight at once
+    connection_limit=100,              # Optional (Default=100)   Total pooled connections (0 is unlimited)
+    connection_limit_per_host=0,       # Optional (Default=0)     Pooled connections per host (0 is unlimited)
+    keepalive_timeout=15,              # Optional (Default=15)    Seconds an idle connection is kept open
+    dns_cache_ttl=10,                  # Optional (Default=10)    Seconds a DNS lookup is cached (None disables the cache)
+    timeout=60,                        # Optional (Default=60)    Seconds per request, `encode(..., timeout=)` overrides it per call, raises TimeoutError
+    response_format="json",            # Optional (Default="json") "json" | "float32" | "msgpack"
+    backend=None                       # Optional (Default=None)  EmbeddingBackend used instead of the embedding server
+)
+
+"""
+    `embedder.pool_stats()` returns connection limits, in-flight requests, peak in-flight requests
+    and how many requests started while the pool was saturated.
+    The Embedder owns its HTTP session. Close it with `await embedder.aclose()` or `async with embedder:`.
+
+    With `response_format="float32"` or `"msgpack"`, the request carries `"format"` and an `Accept` header, and
+    `encode` returns NumPy float32 arrays decoded without per-element Python objects.
+      float32   application/octet-stream   8-byte header (<II rows, dimension) + rows * dimension little-endian float32
+      msgpack   application/msgpack        {"shape": [rows, dimension], "data": <little-endian float32 bytes>} (requires msgpack)
+    If the embedding server answers with JSON instead, the JSON result is converted to the same arrays.
+"""
+
+#& Offline Embedding Backend (Optional)
+"""
+    <EmbeddingBackend> - Subclass and implement `async encode(message)` (and optionally `async aclose()`)
+    <HashingEmbeddingBackend> - Deterministic in-process embeddings (hashed word counts times a fixed random projection)
+    dimension    [integer, optional(default=768)]
+    buckets      [integer, optional(default=4096)]
+    seed         [integer, optional(default=0)]
+
+    Stand-in embedding server with the same contract, backed by HashingEmbeddingBackend:
+    python -m Milvus.EmbeddingServer --port 7777 --dimension 768 --latency-ms 5 --latency-per-text-ms 0.1 --jitter-ms 2
+"""
+offline_embedder: Embedder = Embedder(backend=HashingEmbeddingBackend(dimension=756))
+title_embedder: Embedder = Embedder(embedding_ip="127.0.0.1", embedding_port=7778, embedding_dimension=384)
+
+#& Executor Instance (Optional)
+"""
+    <MilvusExecutor> - Thread Pools for Blocking pymilvus Calls
+    read_workers     [integer, optional(default=8)]    Threads for search / query
+    write_workers    [integer, optional(default=4)]    Threads for insert / delete / flush / collection setup and drops
+    max_queue_depth  [integer, optional(default=256)]  Calls waiting per pool beyond the workers, more raise `ExecutorOverloadedError`
+
+    `executor.stats()` returns workers, pending and rejected calls per pool.
+"""
+executor: MilvusExecutor = MilvusExecutor(read_workers=8, write_workers=4, max_queue_depth=256)
+
+#& Result Cache (Optional)
+"""
+    <ResultCache> - In-Memory LRU Cache of `retrieval` / `retrieval_many` / `hybrid_retrieval` / `find` Results
+    max_entries  [integer, optional(default=1024)]  Least recently used results are evicted beyond this count
+    ttl_seconds  [float,   optional(default=None)]  Cached results expire after this many seconds
+
+    * A hit returns a copy without calling the embedder or Milvus.
+    * `insert` / `ingest` / `delete` / `clear_collections` of the repository drop the cached results of that collection,
+      writes of other clients are only picked up after `ttl_seconds`.
+    * Reads with `consistency_level="Strong"` always go to Milvus.
+    * One cache can be shared by several repositories, including MongoRepository.
+
+    `result_cache.stats()` returns entries, hits, misses, evictions, invalidations, hit_rate and hits / misses / hit_rate per collection.
+"""
+result_cache: ResultCache = ResultCache(max_entries=1024, ttl_seconds=60)
+
+#& Single Flight (Optional)
+"""
+    <SingleFlight> - Shares One Call between Identical Concurrent Reads
+    * Concurrent `retrieval` / `retrieval_many` / `hybrid_retrieval` / `find` calls with the same arguments wait for
+      one embedding request and one Milvus call, and each caller gets its own copy of the result.
+    * A read issued after a write of the repository to the collection starts its own call.
+    * Reads with `consistency_level="Strong"` are never shared.
+
+    `single_flight.stats()` returns in_flight, calls (started) and shared (callers that joined a running call).
+"""
+single_flight: SingleFlight = SingleFlight()
 
 #& Repository Instance
 milvus_repository: MilvusRepository = MilvusRepository(
@@ -16,9 +132,41 @@ milvus_repository: MilvusRepository = MilvusRepository(
     index_type="IVF_FLAT",             # Optional (Default="IVF_FLAT")
     limit=3,                           # Optional (Default=3)
     embedding_server_host="127.0.0.1", # Optional (Default="127.0.0.1")
-    embedding_server_port=7777         # Optional (Default=7777)
+    embedding_server_port=7777,        # Optional (Default=7777)
+    embedder=embedder,                 # Optional (Default=None) If set, `embedding_server_host` and `embedding_server_port` are ignored
+    normalize=True,                    # Optional (Default=False) L2-normalize embeddings before insert and search ("COSINE" and "IP" only)
+    write_behind=True,                 # Optional (Default=False) Buffer inserts in process instead of inserting and flushing per call
+    write_buffer_rows=1000,            # Optional (Default=1000)  Send buffered rows to Milvus once this many are waiting
+    write_buffer_interval_ms=1000,     # Optional (Default=1000)  Send buffered rows after this long (None leaves it to the size threshold)
+    executor=executor,                 # Optional (Default=None) Owned MilvusExecutor with default settings if None
+    expected_rows=1000000,             # Optional (Default=None) Used to derive IVF `nlist` (about 4 * sqrt(rows), 1024 if None)
+    milvus_uri=None,                   # Optional (Default=None) e.g. "./milvus.db" for milvus-lite, `milvus_host` and `milvus_port` are ignored if set
+    in_list_batch_size=1000,           # Optional (Default=1000) `find` / `iter_find` / `delete` split a longer `Field.isin` list of a filter expression into batches
+    result_cache=result_cache,         # Optional (Default=None) Results are not cached if None
+    single_flight=single_flight        # Optional (Default=None) Identical concurrent reads are not shared if None
 )
 
+#& Close Repository
+async def close():
+    await milvus_repository.aclose()   # Closes the Embedder HTTP session, raises if buffered rows could not be written
+
+async def use_context_manager():
+    async with MilvusRepository(embedding_dimension=756) as repository:
+        ...
+
+#& Flush Function
+async def flush():
+    """
+        Sends buffered rows to Milvus and seals them with `Collection.flush()`.
+        In write-behind mode, buffered rows are otherwise sealed by Milvus auto-flush.
+        Rows of a failed insert stay buffered and are retried here, the error is raised if they still can not be written.
+
+        #* [Request]
+        collection        Collection Name                  [string, optional(default=None)] All collections if None
+    """
+    await milvus_repository.flush()
+    await milvus_repository.flush("test_collection")
+
 #& Delete Collection
 milvus_repository.clear_collections()                   # Delete All Collections
 milvus_repository.clear_collections("test_collection")  # Delete Collection with Name
@@ -27,19 +175,49 @@ milvus_repository.clear_collections(["test1", "test2"]) # Delete Collection with
 #& Collection Field
 """
     <StringField> - String Type Field
-    name        [string, required]
-    max_length  [integer, optional(default=256)]
+    name           [string, required]
+    max_length     [integer, optional(default=256)]
+    partition_key  [boolean, optional(default=False)]  Milvus partition key, rows are hashed into partitions by this field
 """
 StringField("user_id")
 StringField(name="user_id", max_length=256)
 StringField("user_id", 256)
+StringField("user_id", partition_key=True)
 
 """
     <VectorField> - Float Vector Field
-    name        [string, required]
+    name          [string, required]
+    dimension     [integer, optional(default=None)]      Repository `embedding_dimension` if None
+    metric_type   [string, optional(default=None)]       Metric of `vector_index`, then repository `metric_type` if None
+    embedder      [Embedder, optional(default=None)]     Repository embedder if None
+    vector_index  [VectorIndex, optional(default=None)]  Collection `vector_index` if None
+
+    * A collection may have several vector fields, the first one is the default field of `retrieval`.
 """
 VectorField("embedding")
 VectorField(name="embedding")
+VectorField("title_embedding", dimension=384, metric_type="IP", embedder=title_embedder, vector_index=VectorIndex("HNSW"))
+
+"""
+    <SparseVectorField> - Sparse Float Vector Field (at most one per collection)
+    name        [string, required]
+
+    * Filled on insert from the same text by the collection's SparseEncoder, no embedding server involved.
+"""
+SparseVectorField("keywords")
+
+#& Sparse Encoder (Optional)
+"""
+    <SparseEncoder> - Local BM25 Sparse Encoder
+    k1              [float, optional(default=1.2)]   Term frequency saturation
+    b               [float, optional(default=0.75)]  Document length normalization
+    average_length  [float, optional(default=None)]  Average document length in tokens, running average of encoded documents if None
+
+    * Tokens are hashed into sparse indices, so there is no vocabulary to keep.
+    * Document frequencies are counted in process as documents are encoded, `fit(texts)` counts an existing corpus after a restart.
+"""
+sparse_encoder = SparseEncoder(k1=1.2, b=0.75)
+sparse_encoder.fit(["I like soccer.", "I love pizza."])
 
 #& Collection Index
 """
@@ -51,6 +229,19 @@ Index("user_id")
 Index(name="user_id", index_type="Trie")
 Index("user_id", "Trie")
 
+"""
+    <VectorIndex> - Vector Field Index
+    index_type     [string,  optional(default="IVF_FLAT")]  "FLAT" | "IVF_FLAT" | "IVF_SQ8" | "IVF_PQ" | "HNSW" | "DISKANN" | "AUTOINDEX"
+    metric_type    [string,  optional(default=None)]        Repository `metric_type` if None
+    expected_rows  [integer, optional(default=None)]        Repository `expected_rows` if None
+    params         [dict,    optional(default={})]          Overrides the derived build params
+
+    Derived build params : IVF_* {"nlist"} (+ IVF_PQ {"m", "nbits"}), HNSW {"M": 16, "efConstruction": 200}
+    Derived search params: IVF_* {"nprobe": nlist / 32}, HNSW {"ef": 64}, DISKANN {"search_list": 100}
+"""
+VectorIndex("HNSW")
+VectorIndex(index_type="IVF_PQ", expected_rows=5000000, params={"m": 32})
+
 #& Add Collection
 milvus_repository.add_collection(
     collection_name="test_collection", # Collection Name
@@ -62,35 +253,230 @@ milvus_repository.add_collection(
     indexes=[                         # Indexes
         Index(name="user_id", index_type="Trie"),
         Index("group_id")
+    ],
+    vector_index=VectorIndex("HNSW"),  # Optional (Default=None) Repository `index_type` if None
+    search_params={"ef": 128}          # Optional (Default=None) Overrides the derived search params of this collection
+)
+
+#& Add Collection with Several Vector Fields
+milvus_repository.add_collection(
+    collection_name="test_collection",
+    collection_fields=[
+        StringField(name="user_id"),
+        VectorField("title", dimension=384, embedder=title_embedder),
+        VectorField("body")
+    ],
+    indexes=[
+        Index("body", "HNSW")          # Optional Index type of a vector field without its own `vector_index`
     ]
 )
 
+#& Add Collection with Sparse Vector Field
+milvus_repository.add_collection(
+    collection_name="test_collection",
+    collection_fields=[
+        StringField(name="user_id"),
+        VectorField("embedding"),
+        SparseVectorField("keywords")
+    ],
+    indexes=[
+        Index("keywords", "SPARSE_INVERTED_INDEX")  # Optional "SPARSE_INVERTED_INDEX" (Default) | "SPARSE_WAND"
+    ],
+    sparse_encoder=sparse_encoder      # Optional (Default=None) New SparseEncoder() if None
+)
+
+#& Add Partitioned Collection
+"""
+    * Partition Key: Milvus hashes rows into `num_partitions` partitions by the partition key field,
+      and a filter such as `user_id == 'dalmeng'` only searches the partition of that key.
+    * Partition Field: one partition per value of `partition_field`, created on the first insert of the value.
+      `insert` routes rows to their partition, and `retrieval` / `find` / `iter_find` / `delete` only read the partitions
+      pinned by `partition_field == '...'` or `partition_field in [...]` (without "or" / "not"), all partitions otherwise.
+      Partitions are loaded when a call first reads them, and the least recently used ones are released beyond `max_loaded_partitions`.
+      A release applies to every client of the server, a call that finds its partition released by another process loads it again and retries once.
+      Milvus caps partitions per collection (`rootCoord.maxPartitionNum`, 1024 by default), use `partition_field` only for a bounded set of values
+      and a partition key otherwise.
+"""
+milvus_repository.add_collection(
+    collection_name="test_collection",
+    collection_fields=[
+        StringField(name="user_id", partition_key=True),
+        VectorField("embedding")
+    ],
+    indexes=[],
+    num_partitions=64                  # Optional (Default=None) Number of partitions for the partition key, Milvus default if None
+)
+milvus_repository.add_collection(
+    collection_name="test_collection",
+    collection_fields=[
+        StringField(name="user_id"),
+        VectorField("embedding")
+    ],
+    indexes=[],
+    partition_field="user_id",         # Optional (Default=None) One partition per value of this string field
+    partitions=["dalmeng"],            # Optional (Default=None) Values whose partitions are created up front
+    max_loaded_partitions=100          # Optional (Default=None) Loaded partitions are never released if None
+)
+
+#& Add Collection without Blocking the Event Loop
+async def add_collection():
+    await milvus_repository.add_collection_async(
+        collection_name="test_collection",
+        collection_fields=[
+            StringField(name="user_id", max_length=256),
+            VectorField("embedding")
+        ],
+        indexes=[
+            Index(name="user_id", index_type="Trie")
+        ]
+    )
+
+#& Filter Expression
+"""
+    Compiles to a Milvus expression string and to a Mongo query document, values are escaped on compile.
+    <Field>   ==, !=, <, <=, >, >=, isin(values), notin(values), like(pattern) ("%" any sequence, "_" one character)
+    <Expression> combined with &, |, ~ or And(...), Or(...), Not(...)
+
+    * Fields are checked against the collection schema, and filtering on a field without an index warns once with `UnindexedFieldWarning`.
+    * Without a filter, nothing is evaluated per row (no match-all expression).
+    * Milvus string literals can not hold line breaks, such a value raises ValueError when compiled for Milvus.
+    * `isin([])` matches nothing and `notin([])` matches everything, Milvus is not queried for a filter that matches nothing.
+"""
+(Field("user_id") == "dalmeng") & Field("group_id").isin(["a", "b"])
+Or(Field("user_id") == "dalmeng", Not(Field("group_id").like("test%")))
+
 #& Retrieval Function
 async def retrieval():
     """
         #* [Request]
         collection        Collection Name                  [string, required]
         text              Similarity Search Sentence       [string, optional(default="Trie")]
-        filter            Condition Filter                 [string, optional(default=None)]
+        filter            Condition Filter                 [string | Expression, optional(default=None)]
         limit             Retrieval Limit                  [integer, optional(default=3)]
+        consistency_level Milvus Consistency Level         [string, optional(default=None)]
+        search_params     Search Params Override           [dict, optional(default=None)] e.g. {"nprobe": 64}, {"ef": 256}
+        fields            Returned Fields                  [list[string], optional(default=None)] All scalar fields if None, only fetched fields are sent by Milvus
+        output            Result Format                    [string, optional(default="dict")] "dict" | "tuple" | "array"
+        with_score        Return Scores with Entities      [boolean, optional(default=False)] "dict" output only
+        min_score         Minimum Similarity Score         [float, optional(default=None)] COSINE / IP only, hits scoring above it
+        radius            Milvus Range Search Radius       [float, optional(default=None)] Any metric, e.g. maximum distance for L2
+        vector_field      Searched Vector Fields           [string | list[string], optional(default=None)] First vector field if None
+        ranker            Fusion Method                    [string, optional(default="rrf")] "rrf" | "weighted", several vector fields only
+        rrf_k             RRF Constant                     [integer, optional(default=60)]
+        weights           Vector Field Weights             [list[float], optional(default=None)] Equal weights if None, "weighted" only
+
+        * The text is embedded with the embedder of each searched vector field.
+        * Several vector fields run in one Milvus hybrid search and are fused by Milvus, scores are fused scores.
+        * With `consistency_level="Strong"` or `"Session"`, buffered writes are sent before searching (read-your-writes).
+        * `min_score` / `radius` run a Milvus range search, hits outside the range are never returned by Milvus.
 
         #* [Response]
-        Return type is list[dict].
+        "dict"  : list[dict], one entity per hit, list[tuple[dict, float]] (entity, score) if `with_score` is True.
+        "tuple" : list[tuple], (id, score, *values of `fields`) per hit.
+        "array" : dict, {"ids": list[string], "scores": numpy float32 array, "fields": {field: list}}.
     """
     result = await milvus_repository.retrieval(
         collection="test_collection",
         text="This is Test Retrieval Sentence.",
+        filter=Field("user_id") == "dalmeng",
+        limit=3,
+        search_params={"ef": 256}
+    )
+    result = await milvus_repository.retrieval(
+        collection="test_collection",
+        text="This is Test Retrieval Sentence.",
+        limit=100,
+        fields=[],
+        output="array"
+    )
+    result = await milvus_repository.retrieval(
+        collection="test_collection",
+        text="This is Test Retrieval Sentence.",
+        limit=100,
+        with_score=True,
+        min_score=0.8
+    )
+    result = await milvus_repository.retrieval(
+        collection="test_collection",
+        text="This is Test Retrieval Sentence.",
+        vector_field=["title", "body"],
+        ranker="weighted",
+        weights=[0.7, 0.3]
+    )
+
+#& Multiple Retrieval Function
+async def retrieval_many():
+    """
+        #* [Request]
+        collection        Collection Name                  [string, required]
+        texts             Similarity Search Sentences      [list[string], required]
+        filter            Condition Filter                 [string | Expression, optional(default=None)]
+        limit             Retrieval Limit per Sentence     [integer, optional(default=3)]
+        consistency_level Milvus Consistency Level         [string, optional(default=None)]
+        search_params     Search Params Override           [dict, optional(default=None)]
+        fields            Returned Fields                  [list[string], optional(default=None)]
+        output            Result Format                    [string, optional(default="dict")] "dict" | "tuple" | "array"
+        with_score        Return Scores with Entities      [boolean, optional(default=False)]
+        min_score         Minimum Similarity Score         [float, optional(default=None)]
+        radius            Milvus Range Search Radius       [float, optional(default=None)]
+        vector_field      Searched Vector Field            [string, optional(default=None)] First vector field if None
+
+        * All sentences are embedded in one request and searched in one Milvus search.
+
+        #* [Response]
+        Return type is a list of `retrieval` results, one per sentence in the same order.
+    """
+    result = await milvus_repository.retrieval_many(
+        collection="test_collection",
+        texts=["I like soccer.", "I love pizza."],
         filter="user_id == 'dalmeng'",
         limit=3
     )
 
+#& Hybrid Retrieval Function
+async def hybrid_retrieval():
+    """
+        #* [Request]
+        collection        Collection Name                  [string, required] (must have a sparse vector field)
+        text              Similarity Search Sentence       [string, required]
+        filter            Condition Filter                 [string | Expression, optional(default=None)]
+        limit             Retrieval Limit                  [integer, optional(default=3)]
+        ranker            Fusion Method                    [string, optional(default="rrf")] "rrf" | "weighted"
+        rrf_k             RRF Constant                     [integer, optional(default=60)]
+        weights           Dense and Sparse Weights         [list[float], optional(default=None)] Equal weights if None, "weighted" only, dense fields first
+        candidates        Candidates per Vector Field      [integer, optional(default=None)] `limit` if None
+        consistency_level Milvus Consistency Level         [string, optional(default=None)]
+        search_params     Dense Search Params Override     [dict, optional(default=None)]
+        fields            Returned Fields                  [list[string], optional(default=None)]
+        output            Result Format                    [string, optional(default="dict")] "dict" | "tuple" | "array"
+        with_score        Return Scores with Entities      [boolean, optional(default=False)]
+        vector_field      Dense Vector Fields              [string | list[string], optional(default=None)] First vector field if None
+
+        * The dense and sparse searches run in one Milvus hybrid search and are fused by Milvus.
+
+        #* [Response]
+        Same as `retrieval`, scores are fused scores.
+    """
+    result = await milvus_repository.hybrid_retrieval(
+        collection="test_collection",
+        text="kubernetes cluster upgrade",
+        limit=5,
+        ranker="weighted",
+        weights=[0.3, 0.7],
+        candidates=20
+    )
+
 #& Find Function
 async def find():
     """
         #* [Request]
         collection        Collection Name                  [string, required]
-        filter            Condition Filter                 [string, optional(default=None)]
+        filter            Condition Filter                 [string | Expression, optional(default=None)]
         find_one          Retrieval Type                   [boolean, optional(default=False)]
+        consistency_level Milvus Consistency Level         [string, optional(default=None)]
+        limit             Maximum Number of Data           [integer, optional(default=None)] (1 if `find_one` is True)
+        offset            Number of Data to Skip           [integer, optional(default=None)] (requires `limit`)
+        fields            Returned Fields                  [list[string], optional(default=None)] All scalar fields if None
 
         #* [Response]
         if `find_one` is True,  return type is dict.
@@ -101,18 +487,49 @@ async def find():
         filter="user_id == 'dalmeng'",
         find_one=True
     )
+    result = await milvus_repository.find(
+        collection="test_collection",
+        filter="user_id == 'dalmeng'",
+        limit=100,
+        offset=200,
+        fields=["group_id"]
+    )
+
+#& Iterate Find Function
+async def iter_find():
+    """
+        #* [Request]
+        collection        Collection Name                  [string, required]
+        filter            Condition Filter                 [string | Expression, optional(default=None)]
+        batch_size        Data per Milvus Query            [integer, optional(default=1000)]
+        consistency_level Milvus Consistency Level         [string, optional(default=None)]
+
+        * Rows are fetched batch by batch with a pymilvus query iterator, so memory stays constant.
+
+        #* [Response]
+        Async generator of dict.
+    """
+    async for data in milvus_repository.iter_find(
+        collection="test_collection",
+        filter="user_id == 'dalmeng'",
+        batch_size=1000
+    ):
+        print(data)
 
 #& Insert Function
 async def insert():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        text              Embedding Sentences         [string | list[string], required]
+        text              Embedding Sentences         [string | dict | list[string | dict], required]
         data              Corresponding Data          [dict   | list[dict],   required]
         insert_one        Insert Type                 [boolean, optional(default=True)]
+        progress          Embedding Progress Callback [function(completed, total), optional(default=None)]
 
         * If type of `text` is string, type of `data` must be dict.
         * If type of `text` is list[string], type of `data` must be list[string] whose length is equal to length of `text`
+        * A dict text gives each vector field its own sentence, e.g. {"title": "...", "body": "..."},
+          the sparse vector field uses its own key or the sentence of the first vector field.
 
         #* [Response]
         if `insert_one` is True,  return type is dict.
@@ -125,6 +542,12 @@ async def insert():
         data={ "user_id": 'dalmeng' },
         insert_one=True
     )
+    #^ If the collection has several vector fields,
+    result = await milvus_repository.insert(
+        collection="test_collection",
+        text={ "title": "Soccer", "body": "I like soccer." },
+        data={ "user_id": 'dalmeng' }
+    )
     #^ If `insert_one` is False,
     result = await milvus_repository.insert(
         collection="test_collection",
@@ -133,7 +556,37 @@ async def insert():
             { "user_id": 'dalmeng' },
             { "user_id": 'dalmeng' },
         ],
-        insert_one=False
+        insert_one=False,
+        progress=lambda completed, total: print(f"Embedded {completed}/{total}")
+    )
+
+#& Ingest Function
+async def ingest():
+    """
+        #* [Request]
+        collection           Collection Name             [string, required]
+        source               (Sentence, Data) Pairs      [iterable | async iterable of tuple(string | dict, dict), required]
+        batch_size           Rows per Batch              [integer, optional(default=512)]
+        max_pending_batches  Batches Waiting per Stage   [integer, optional(default=2)]
+        progress             Progress Callback           [function(stats), optional(default=None)]
+
+        * Reading, embedding and inserting run as overlapping stages with bounded queues,
+          so memory stays bounded regardless of the size of `source`.
+
+        #* [Response]
+        Return type is dict. { "rows": int, "seconds": float, "rows_per_second": float }
+    """
+    def corpus():
+        with open("corpus.tsv") as f:
+            for line in f:
+                user_id, sentence = line.rstrip("\n").split("\t")
+                yield sentence, { "user_id": user_id }
+
+    result = await milvus_repository.ingest(
+        collection="test_collection",
+        source=corpus(),
+        batch_size=512,
+        progress=lambda stats: print(f"{stats['rows']} rows, {stats['rows_per_second']:.0f} rows/sec")
     )
 
 #& Delete Function
@@ -141,15 +594,27 @@ async def insert():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        filter            Condition Filter            [string, optional(default=None)]
+        filter            Condition Filter            [string | Expression, optional(default=None)]
+        return_deleted    Return Deleted Data         [boolean, optional(default=True)]
+        batch_size        Data per Delete Batch       [integer, optional(default=None)]
+
+        * If `return_deleted` is True, matching data is streamed and deleted by primary key in batches (default 1000).
+        * If `return_deleted` is False, only the count is returned and nothing is read back,
+          unless `batch_size` is set to delete by primary key in bounded batches.
 
         #* [Response]
-        Return type is list.
+        if `return_deleted` is True,  return type is list[dict].
+        if `return_deleted` is False, return type is integer.
     """
     result = await milvus_repository.delete(
         collection="test_collection",
         filter="user_id == 'dalmeng'"
     )
+    result = await milvus_repository.delete(
+        collection="test_collection",
+        filter="user_id == 'dalmeng'",
+        return_deleted=False
+    )
 
 #! ================================================================================
 
@@ -159,6 +624,9 @@ async def insert():
     
 #& Imports
 from Mongo.MongoRepository import MongoRepository
+from Filter.Filter import Field
+from Cache.ResultCache import ResultCache
+from Cache.SingleFlight import SingleFlight
 
 #& Repository Instance
 mongo_repository: MongoRepository = MongoRepository(
@@ -167,7 +635,9 @@ mongo_repository: MongoRepository = MongoRepository(
     table="test_table",                 # Required
     host="127.0.0.1",                   # Optional (Default="127.0.0.1")
     port=27017,                         # Optional (Default=27017)
-    authentication_database="admin"     # Optional (Default="admin")
+    authentication_database="admin",    # Optional (Default="admin")
+    result_cache=ResultCache(),         # Optional (Default=None) `find` results are cached until this repository writes the collection
+    single_flight=SingleFlight()        # Optional (Default=None) Identical concurrent `find` calls share one query
 )
 
 #& Delete Collection
@@ -180,8 +650,9 @@ async def find():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        filter            Condition Filter            [dict, optional(default={})]
+        filter            Condition Filter            [dict | Expression, optional(default={})]
         find_one          Find Type                   [boolean, optional(default=False)]
+        fields            Returned Fields             [list[string], optional(default=None)] Projected by MongoDB, all fields if None
 
         #* [Response]
         if `find_one` is True,  return type is dict.
@@ -192,40 +663,65 @@ async def find():
         filter={"username": "dalmeng"},
         find_one=True
     )
+    result = await mongo_repository.find(
+        collection="test_collection",
+        filter=Field("username") == "dalmeng",  # Filter Expression, warns once if "username" has no index
+        fields=["username"]
+    )
     
 #& Update / Insert Function
 async def upsert():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        filter            Condition Filter            [dict, required]
+        filter            Condition Filter            [dict | Expression, required]
         data              Upsert Data                 [dict, required]
+        partial           Update Only Given Fields    [boolean, optional(default=False)] `$set` of `data` instead of replacing the document
+
+        * One atomic write (`replace_one` / `find_one_and_update` with `upsert=True`), no read before it.
+          A unique index on the filter fields keeps concurrent upserts of the same filter from inserting twice.
+        * With `partial`, an inserted document also gets the equality fields of `filter`.
 
         #* [Response]
-        Return type is dict.
+        Return type is dict. `data` if `partial` is False, the whole document after the write if `partial` is True.
     """
     result = await mongo_repository.upsert(
         collection="test_collection",
         filter={"username": "dalmeng"},
         data={"username": "dalmengs"}
     )
+    result = await mongo_repository.upsert(
+        collection="test_collection",
+        filter={"username": "dalmeng"},
+        data={"visits": 1},
+        partial=True
+    )
 
 #& Update Function
 async def update():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        filter            Condition Filter            [dict, required]
+        filter            Condition Filter            [dict | Expression, required]
         data              Update Data                 [dict, required]
+        partial           Update Only Given Fields    [boolean, optional(default=False)] `$set` of `data` instead of replacing the document
+
+        * One atomic write (`find_one_and_replace` / `find_one_and_update`), DataError if nothing matches `filter`.
 
         #* [Response]
-        Return type is dict.
+        Return type is dict. `data` if `partial` is False, the whole document after the write if `partial` is True.
     """
     result = await mongo_repository.update(
         collection="test_collection",
         filter={"username": "dalmeng"},
         data={"username": "dalmengs"}
     )
+    result = await mongo_repository.update(
+        collection="test_collection",
+        filter={"username": "dalmeng"},
+        data={"visits": 2},
+        partial=True
+    )
 
 #& Insert Function
 async def insert():
@@ -257,13 +753,24 @@ async def delete():
     """
         #* [Request]
         collection        Collection Name             [string, required]
-        filter            Condition Filter            [dict, optional(default={})]
+        filter            Condition Filter            [dict | Expression, optional(default={})]
+        return_deleted    Return Deleted Data         [boolean, optional(default=True)]
+        batch_size        Data per Delete Batch       [integer, optional(default=1000)]
+
+        * If `return_deleted` is True, matching data is streamed and deleted by `_id` in batches.
+        * If `return_deleted` is False, one `delete_many` runs and only the count is returned.
 
         #* [Response]
-        Return type is list[dict].
+        if `return_deleted` is True,  return type is list[dict].
+        if `return_deleted` is False, return type is integer.
     """
     result = await mongo_repository.delete(
         collection="test_collection",
         filter={"username": "dalmeng"}
     )
+    result = await mongo_repository.delete(
+        collection="test_collection",
+        filter={"username": "dalmeng"},
+        return_deleted=False
+    )
     
\ No newline at end of file
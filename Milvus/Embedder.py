@@ -1,43 +1,335 @@
+import re
+import zlib
+import asyncio
+import inspect
+import struct
 import aiohttp
 import json as j
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Optional
+from Milvus.EmbeddingCache import content_key
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "float32": "application/octet-stream",
+    "msgpack": "application/msgpack"
+}
+
+class EmbeddingBackend(ABC):
+
+    @abstractmethod
+    async def encode(self, message):
+        pass
+
+    async def aclose(self):
+        pass
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    TOKEN = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = 768, buckets: int = 4096, seed: int = 0):
+        self.__dimension = int(dimension)
+        self.__buckets = int(buckets)
+        # Fixed random projection from hashed token counts to the embedding space
+        self.__projection = np.random.default_rng(seed).standard_normal((self.__buckets, self.__dimension), dtype=np.float32)
+
+    def embed(self, texts: list):
+        rows, columns, signs = [], [], []
+        for i, text in enumerate(texts):
+            for token in self.TOKEN.findall(text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                rows.append(i)
+                columns.append(h % self.__buckets)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        counts = np.zeros((len(texts), self.__buckets), dtype=np.float32)
+        np.add.at(counts, (rows, columns), signs)
+        matrix = counts @ self.__projection
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    async def encode(self, message):
+        if isinstance(message, str):
+            return self.embed([message])[0]
+        return self.embed(message)
 
 class Embedder:
 
-    def __init__(self, embedding_ip, embedding_port):
+    def __init__(self, embedding_ip="127.0.0.1", embedding_port=7777, coalesce: bool = False, max_batch_size: int = 64, max_wait_ms: float = 5, cache=None, model: Optional[str] = None, embedding_dimension: Optional[int] = None, chunk_size: int = 512, max_concurrent_chunks: int = 4, connection_limit: int = 100, connection_limit_per_host: int = 0, keepalive_timeout: float = 15, dns_cache_ttl: int = 10, timeout: float = 60, response_format: str = "json", backend: Optional[EmbeddingBackend] = None):
         self.__embedding_endpoint = "http://{ip}:{port}/api/v1/embedding".format(
             ip=embedding_ip,
             port=embedding_port
         )
+        self.__coalesce = coalesce
+        self.__max_batch_size = int(max_batch_size)
+        self.__max_wait = float(max_wait_ms) / 1000
+        self.__pending = []
+        self.__flush_handle = None
+        self.__dispatching = set()
+        self.__cache = cache
+        self.__model = model
+        self.__embedding_dimension = embedding_dimension
+        self.__chunk_size = int(chunk_size)
+        self.__chunk_semaphore = asyncio.Semaphore(int(max_concurrent_chunks))
+        self.__connection_limit = int(connection_limit)
+        self.__connection_limit_per_host = int(connection_limit_per_host)
+        self.__keepalive_timeout = keepalive_timeout
+        self.__dns_cache_ttl = dns_cache_ttl
+        self.__timeout = timeout
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError("Response format must be one of {}.".format(", ".join(RESPONSE_FORMATS)))
+        if response_format == "msgpack" and msgpack is None:
+            raise ValueError("To use msgpack response format, msgpack must be installed.")
+        self.__response_format = response_format
+        self.__backend = backend
+        self.__session = None
+        self.__in_flight = 0
+        self.__peak_in_flight = 0
+        self.__saturated = 0
+        self.__requests = 0
 
-    async def encode(self, message):
-        embedding_result = await Request.post(
-            url=self.__embedding_endpoint,
-            headers={
-                "Content-type": "application/json"
-            },
-            data={
-                "text": message
-            }
-        )
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.__flush_handle:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+        if self.__pending:
+            self.__flush_pending()
+        if self.__dispatching:
+            await asyncio.gather(*self.__dispatching, return_exceptions=True)
+        if self.__session:
+            await self.__session.close()
+            self.__session = None
+        if self.__backend:
+            await self.__backend.aclose()
+
+    def pool_stats(self):
+        return {
+            "connection_limit": self.__connection_limit,
+            "connection_limit_per_host": self.__connection_limit_per_host,
+            "in_flight": self.__in_flight,
+            "peak_in_flight": self.__peak_in_flight,
+            "saturated": self.__saturated,
+            "requests": self.__requests
+        }
+
+    def __get_session(self):
+        if not self.__session or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.__connection_limit,
+                limit_per_host=self.__connection_limit_per_host,
+                keepalive_timeout=self.__keepalive_timeout,
+                use_dns_cache=self.__dns_cache_ttl is not None,
+                ttl_dns_cache=self.__dns_cache_ttl
+            )
+            self.__session = aiohttp.ClientSession(connector=connector)
+        return self.__session
+
+    @property
+    def cache(self):
+        return self.__cache
+
+    async def encode(self, message, progress=None, timeout: Optional[float] = None):
+        if self.__cache is None:
+            return await self.__encode(message, progress, timeout)
+
+        if isinstance(message, str):
+            key = content_key(message, self.__model, self.__embedding_dimension)
+            vector = self.__cache.get(key)
+            if vector is None:
+                vector = owned(await self.__encode(message, timeout=timeout))
+                self.__cache.put(key, vector)
+            return vector
+
+        keys = [content_key(m, self.__model, self.__embedding_dimension) for m in message]
+        vectors = [self.__cache.get(key) for key in keys]
+
+        misses = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                misses.setdefault(keys[i], []).append(i)
+        if not misses:
+            return vectors
+
+        embedded_vectors = await self.__encode([message[indexes[0]] for indexes in misses.values()], progress, timeout)
+        for (key, indexes), vector in zip(misses.items(), embedded_vectors):
+            vector = owned(vector)
+            self.__cache.put(key, vector)
+            for i in indexes:
+                vectors[i] = vector
+        return vectors
+
+    async def __encode(self, message, progress=None, timeout: Optional[float] = None):
+        if not isinstance(message, str):
+            return await self.__request_chunks(message, progress, timeout)
+        if self.__coalesce:
+            return await self.__enqueue(message, timeout)
+        return await self.__request(message, timeout)
+
+    async def __request_chunks(self, message: list, progress=None, timeout: Optional[float] = None):
+        if not message:
+            return []
+        completed = 0
+
+        async def request_chunk(chunk: list):
+            nonlocal completed
+            async with self.__chunk_semaphore:
+                vectors = await self.__request(chunk, timeout)
+            if len(vectors) != len(chunk):
+                raise ValueError("Embedding server returned {} vectors for {} texts.".format(len(vectors), len(chunk)))
+
+            completed += len(chunk)
+            if progress:
+                reported = progress(completed, len(message))
+                if inspect.isawaitable(reported):
+                    await reported
+            return vectors
+
+        tasks = [
+            asyncio.ensure_future(request_chunk(message[i:i + self.__chunk_size]))
+            for i in range(0, len(message), self.__chunk_size)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if all(isinstance(vectors, np.ndarray) for vectors in results):
+            return results[0] if len(results) == 1 else np.concatenate(results)
+
+        ret = []
+        for vectors in results:
+            ret.extend(vectors)
+        return ret
+
+    async def __enqueue(self, message: str, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.__pending.append((message, future))
+
+        if len(self.__pending) >= self.__max_batch_size:
+            self.__flush_pending()
+        elif not self.__flush_handle:
+            self.__flush_handle = loop.call_later(self.__max_wait, self.__flush_pending)
+
+        if timeout:
+            # The shared batch keeps running for the other callers
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        return await future
+
+    def __flush_pending(self):
+        if self.__flush_handle:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+
+        batch, self.__pending = self.__pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self.__dispatch(batch))
+        self.__dispatching.add(task)
+        task.add_done_callback(self.__dispatching.discard)
+
+    async def __dispatch(self, batch: list):
+        try:
+            vectors = await self.__request_chunks([message for message, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def __request(self, message, timeout: Optional[float] = None):
+        if self.__backend:
+            return await self.__backend.encode(message)
+
+        self.__requests += 1
+        if self.__connection_limit and self.__in_flight >= self.__connection_limit:
+            self.__saturated += 1
+        self.__in_flight += 1
+        self.__peak_in_flight = max(self.__peak_in_flight, self.__in_flight)
+        try:
+            embedding_result = await Request.post(
+                url=self.__embedding_endpoint,
+                headers={
+                    "Content-type": "application/json",
+                    "Accept": RESPONSE_FORMATS[self.__response_format]
+                },
+                # JSON servers get the original body, a binary format is also named in the body for servers that ignore Accept
+                data={"text": message} if self.__response_format == "json" else {"text": message, "format": self.__response_format},
+                timeout=timeout if timeout else self.__timeout,
+                session=self.__get_session()
+            )
+        finally:
+            self.__in_flight -= 1
+
+        if embedding_result.status_code != 200:
+            raise ConnectionError("Embedding server request failed with status {}: {}".format(embedding_result.status_code, embedding_result.msg))
+
+        if embedding_result.content_type == RESPONSE_FORMATS["float32"]:
+            matrix = decode_float32(embedding_result.content)
+        elif embedding_result.content_type == RESPONSE_FORMATS["msgpack"] and msgpack:
+            matrix = decode_msgpack(embedding_result.content)
+        else:
+            matrix = None
+
+        if matrix is not None:
+            return matrix[0] if isinstance(message, str) else matrix
         
         if isinstance(message, str):
-            return embedding_result.json()["data"]["embedding_result"]
+            vector = embedding_result.json()["data"]["embedding_result"]
+            return vector if self.__response_format == "json" else np.asarray(vector, dtype=np.float32)
         
         ret = []
         for i in embedding_result.json()["data"]:
             ret.append(i["embedding_result"])
         
-        return ret
+        return ret if self.__response_format == "json" else np.asarray(ret, dtype=np.float32)
+
+def owned(vector):
+    # A row of a decoded batch is a view that keeps the whole response alive, a cached row gets its own copy
+    if isinstance(vector, np.ndarray) and vector.base is not None:
+        return vector.copy()
+    return vector
+
+def decode_float32(content: bytes):
+    # 8-byte header (<II rows, dimension) followed by rows * dimension little-endian float32
+    rows, dimension = struct.unpack_from("<II", content)
+    return np.frombuffer(content, dtype="<f4", count=rows * dimension, offset=8).reshape(rows, dimension)
+
+def decode_msgpack(content: bytes):
+    # {"shape": [rows, dimension], "data": <little-endian float32 bytes>}
+    payload = msgpack.unpackb(content)
+    return np.frombuffer(payload["data"], dtype="<f4").reshape(payload["shape"])
 
 class Request:
     session = None
 
     class Response:
-        def __init__(self, status_code, msg="succeed", data=None, content=None):
+        def __init__(self, status_code, msg="succeed", data=None, content=None, content_type=None):
             self.status_code = status_code
             self.msg = msg
             self.data = data
             self.content = content
+            self.content_type = content_type
 
         def json(self):
             try:
@@ -46,13 +338,14 @@ class Request:
                 return j.loads(self.content)
 
     @staticmethod
-    async def post(url, headers: dict = {}, data: dict = {}, timeout=60):
-        if not Request.session:
-            timeout = aiohttp.ClientTimeout(total=timeout)
-            Request.session = aiohttp.ClientSession(timeout=timeout)
+    async def post(url, headers: dict = {}, data: dict = {}, timeout=60, session: Optional[aiohttp.ClientSession] = None):
+        if not session:
+            if not Request.session:
+                Request.session = aiohttp.ClientSession()
+            session = Request.session
 
         try:
-            res = await Request.session.post(url, headers=headers, json=data)
+            res = await session.post(url, headers=headers, json=data, timeout=aiohttp.ClientTimeout(total=timeout))
 
             data = None
             content = None
@@ -64,13 +357,17 @@ class Request:
             return Request.Response(
                 status_code=res.status,
                 data=data,
-                content=content
+                content=content,
+                content_type=res.content_type
             )
         except aiohttp.ClientError as e:
             return Request.Response(
                 status_code=400,
                 msg=str(e)
             )
+        except asyncio.TimeoutError:
+            # A timeout raises as it does on the coalesced path
+            raise
         except Exception as e:
             return Request.Response(
                 status_code=500,
@@ -0,0 +1,253 @@
+import os
+import sys
+import mmap
+import time
+import fcntl
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import Optional
+
+def content_key(text: str, model: Optional[str] = None, dimension: Optional[int] = None):
+    digest = hashlib.sha256()
+    digest.update("{}:{}:".format(model or "", dimension or "").encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+class EmbeddingCache:
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = None):
+        self.__max_bytes = int(max_bytes)
+        self.__ttl = float(ttl_seconds) if ttl_seconds else None
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        vector, size, expires_at = entry
+        if expires_at and expires_at <= time.monotonic():
+            self.__remove(key)
+            self.misses += 1
+            return None
+
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, key: str, vector):
+        size = _sizeof(vector) + len(key)
+        if size > self.__max_bytes:
+            return
+
+        if key in self.__entries:
+            self.__remove(key)
+        expires_at = time.monotonic() + self.__ttl if self.__ttl else None
+        self.__entries[key] = (vector, size, expires_at)
+        self.__bytes += size
+
+        while self.__bytes > self.__max_bytes:
+            oldest = next(iter(self.__entries))
+            self.__remove(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        self.__entries.clear()
+        self.__bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.__entries),
+            "bytes": self.__bytes,
+            "max_bytes": self.__max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def __remove(self, key: str):
+        _, size, _ = self.__entries.pop(key)
+        self.__bytes -= size
+
+    def __len__(self):
+        return len(self.__entries)
+
+class DiskEmbeddingCache:
+    DIGEST_SIZE = 32
+
+    def __init__(self, path: str, dimension: int, read_only: bool = False):
+        self.__vector_path = path + ".vectors"
+        self.__index_path = path + ".index"
+        self.__dimension = int(dimension)
+        self.__row_size = self.__dimension * 4
+        self.__read_only = read_only
+        self.__rows = {}
+        self.__index_offset = 0
+        self.__mapped = None
+        self.__matrix = None
+        self.__lock_file = None
+        self.hits = 0
+        self.misses = 0
+
+        if not read_only:
+            self.__lock_file = open(path + ".lock", "a")
+            try:
+                fcntl.flock(self.__lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.__lock_file.close()
+                raise RuntimeError("Another process is already writing to {}.".format(path))
+            self.__repair()
+            self.__vector_file = open(self.__vector_path, "ab", buffering=0)
+            self.__index_file = open(self.__index_path, "ab", buffering=0)
+
+        self.refresh()
+
+    def get(self, key: str):
+        row = self.__rows.get(_digest(key))
+        if row is None and self.refresh():
+            row = self.__rows.get(_digest(key))
+        if row is None:
+            self.misses += 1
+            return None
+
+        if self.__matrix is None or row >= len(self.__matrix):
+            self.__remap()
+        self.hits += 1
+        # Read-only view into the mapped file, no copy
+        return self.__matrix[row]
+
+    def put(self, key: str, vector):
+        if self.__read_only:
+            return
+        digest = _digest(key)
+        if digest in self.__rows:
+            return
+
+        vector = np.asarray(vector, dtype="<f4")
+        if vector.shape != (self.__dimension,):
+            raise ValueError("Vector dimension must be {}.".format(self.__dimension))
+
+        # Vector first, index record last: readers only trust rows that have an index record
+        self.__vector_file.write(vector.tobytes())
+        self.__index_file.write(digest)
+        self.__rows[digest] = self.__index_offset // self.DIGEST_SIZE
+        self.__index_offset += self.DIGEST_SIZE
+
+    def refresh(self):
+        try:
+            index_size = os.path.getsize(self.__index_path)
+        except FileNotFoundError:
+            return False
+        if index_size - self.__index_offset < self.DIGEST_SIZE:
+            return False
+
+        with open(self.__index_path, "rb") as f:
+            f.seek(self.__index_offset)
+            records = f.read((index_size - self.__index_offset) // self.DIGEST_SIZE * self.DIGEST_SIZE)
+
+        row = self.__index_offset // self.DIGEST_SIZE
+        for i in range(0, len(records), self.DIGEST_SIZE):
+            self.__rows.setdefault(records[i:i + self.DIGEST_SIZE], row)
+            row += 1
+        self.__index_offset += len(records)
+        return True
+
+    def close(self):
+        if self.__lock_file:
+            self.__vector_file.close()
+            self.__index_file.close()
+            fcntl.flock(self.__lock_file, fcntl.LOCK_UN)
+            self.__lock_file.close()
+            self.__lock_file = None
+
+        self.__matrix = None
+        mapped, self.__mapped = self.__mapped, None
+        if mapped:
+            try:
+                mapped.close()
+            except BufferError:
+                # Vectors returned by get() still view the mapping, it is unmapped once they are released
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.__rows),
+            "bytes": len(self.__rows) * self.__row_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def __remap(self):
+        rows = self.__index_offset // self.DIGEST_SIZE
+        with open(self.__vector_path, "rb") as f:
+            # Vectors returned earlier keep the previous mapping alive until they are released
+            self.__mapped = mmap.mmap(f.fileno(), rows * self.__row_size, access=mmap.ACCESS_READ)
+        self.__matrix = np.frombuffer(self.__mapped, dtype="<f4", count=rows * self.__dimension).reshape(rows, self.__dimension)
+
+    def __repair(self):
+        # Drop a torn tail left by a writer that died between the two appends
+        vector_size = os.path.getsize(self.__vector_path) if os.path.exists(self.__vector_path) else 0
+        index_size = os.path.getsize(self.__index_path) if os.path.exists(self.__index_path) else 0
+        rows = min(vector_size // self.__row_size, index_size // self.DIGEST_SIZE)
+        if vector_size != rows * self.__row_size:
+            os.truncate(self.__vector_path, rows * self.__row_size)
+        if index_size != rows * self.DIGEST_SIZE:
+            os.truncate(self.__index_path, rows * self.DIGEST_SIZE)
+
+    def __len__(self):
+        return len(self.__rows)
+
+class TieredEmbeddingCache:
+
+    def __init__(self, *tiers):
+        self.__tiers = tiers
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        for i, tier in enumerate(self.__tiers):
+            vector = tier.get(key)
+            if vector is not None:
+                for upper in self.__tiers[:i]:
+                    upper.put(key, vector)
+                self.hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def put(self, key: str, vector):
+        for tier in self.__tiers:
+            tier.put(key, vector)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tiers": [tier.stats() for tier in self.__tiers]
+        }
+
+def _digest(key: str):
+    if len(key) == 64:
+        try:
+            return bytes.fromhex(key)
+        except ValueError:
+            pass
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+def _sizeof(vector):
+    if hasattr(vector, "nbytes"):
+        return int(vector.nbytes)
+    # Python list of floats: list header plus one boxed float per element
+    return sys.getsizeof(vector) + len(vector) * sys.getsizeof(0.0)
@@ -0,0 +1,80 @@
+import random
+import struct
+import asyncio
+import argparse
+import numpy as np
+from aiohttp import web
+from Milvus.Embedder import HashingEmbeddingBackend, RESPONSE_FORMATS, msgpack
+
+"""
+    Local stand-in for the embedding server
+
+    python -m Milvus.EmbeddingServer --port 7777 --dimension 768 --latency-ms 5 --latency-per-text-ms 0.1
+
+    * Speaks the same `/api/v1/embedding` contract as the real server, including the float32 / msgpack
+      response formats, with vectors from `HashingEmbeddingBackend`.
+    * Every request sleeps `latency_ms + latency_per_text_ms * texts + uniform(0, jitter_ms)` before answering.
+"""
+
+def create_app(backend: HashingEmbeddingBackend = None, latency_ms: float = 0, latency_per_text_ms: float = 0, jitter_ms: float = 0):
+    backend = backend if backend else HashingEmbeddingBackend()
+
+    async def embedding(request):
+        body = await request.json()
+        text = body["text"]
+        texts = [text] if isinstance(text, str) else text
+
+        delay = latency_ms + latency_per_text_ms * len(texts) + (random.uniform(0, jitter_ms) if jitter_ms else 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        matrix = np.ascontiguousarray(backend.embed(texts), dtype="<f4")
+
+        accept = request.headers.get("Accept", "")
+        if RESPONSE_FORMATS["float32"] in accept:
+            return web.Response(
+                body=struct.pack("<II", *matrix.shape) + matrix.tobytes(),
+                content_type=RESPONSE_FORMATS["float32"]
+            )
+        if RESPONSE_FORMATS["msgpack"] in accept and msgpack:
+            return web.Response(
+                body=msgpack.packb({"shape": list(matrix.shape), "data": matrix.tobytes()}),
+                content_type=RESPONSE_FORMATS["msgpack"]
+            )
+
+        if isinstance(text, str):
+            return web.json_response({"data": {"embedding_result": matrix[0].tolist()}})
+        return web.json_response({"data": [{"embedding_result": vector} for vector in matrix.tolist()]})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/api/v1/embedding", embedding)
+    return app
+
+async def start_embedding_server(host: str = "127.0.0.1", port: int = 7777, **kwargs):
+    runner = web.AppRunner(create_app(**kwargs))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    # Port 0 picks a free port
+    return runner, site._server.sockets[0].getsockname()[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--latency-per-text-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(
+            backend=HashingEmbeddingBackend(dimension=args.dimension, seed=args.seed),
+            latency_ms=args.latency_ms,
+            latency_per_text_ms=args.latency_per_text_ms,
+            jitter_ms=args.jitter_ms
+        ),
+        host=args.host,
+        port=args.port
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+class ExecutorOverloadedError(RuntimeError):
+    pass
+
+class MilvusExecutor:
+
+    def __init__(self, read_workers: int = 8, write_workers: int = 4, max_queue_depth: Optional[int] = 256):
+        self.__pools = {
+            "read": ThreadPoolExecutor(max_workers=int(read_workers), thread_name_prefix="dalmeng_pydb_read"),
+            "write": ThreadPoolExecutor(max_workers=int(write_workers), thread_name_prefix="dalmeng_pydb_write")
+        }
+        self.__workers = {
+            "read": int(read_workers),
+            "write": int(write_workers)
+        }
+        self.__max_queue_depth = int(max_queue_depth) if max_queue_depth else None
+        self.__depth = {"read": 0, "write": 0}
+        self.__rejected = {"read": 0, "write": 0}
+
+    async def run(self, pool: str, func, *args, shed: bool = True):
+        if pool not in self.__pools:
+            raise ValueError("Pool must be one of {}.".format(", ".join(self.__pools)))
+
+        # Calls beyond the running workers wait in the pool queue, shed them once it is full
+        if shed and self.__max_queue_depth and self.__depth[pool] >= self.__workers[pool] + self.__max_queue_depth:
+            self.__rejected[pool] += 1
+            raise ExecutorOverloadedError("Too many pending {} calls to Milvus.".format(pool))
+
+        self.__depth[pool] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__pools[pool], functools.partial(func, *args))
+        finally:
+            self.__depth[pool] -= 1
+
+    def stats(self):
+        return {
+            pool: {
+                "workers": self.__workers[pool],
+                "pending": self.__depth[pool],
+                "rejected": self.__rejected[pool]
+            }
+            for pool in self.__pools
+        }
+
+    def shutdown(self, wait: bool = True):
+        for pool in self.__pools.values():
+            pool.shutdown(wait=wait)
@@ -1,12 +1,25 @@
-def StringField(name: str, max_length: int = 256):
+from typing import Optional
+
+def StringField(name: str, max_length: int = 256, partition_key: bool = False):
     return {
         "type": "string",
         "name": name,
-        "max_length": max_length
+        "max_length": max_length,
+        "partition_key": partition_key
     }
 
-def VectorField(name: str,):
+def VectorField(name: str, dimension: Optional[int] = None, metric_type: Optional[str] = None, embedder=None, vector_index: Optional[dict] = None):
     return {
         "type": "vector",
+        "name": name,
+        "dimension": dimension,
+        "metric_type": metric_type,
+        "embedder": embedder,
+        "vector_index": vector_index
+    }
+
+def SparseVectorField(name: str):
+    return {
+        "type": "sparse_vector",
         "name": name
     }
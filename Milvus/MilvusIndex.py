@@ -1,5 +1,39 @@
+import math
+from typing import Optional
+
 def Index(name: str, index_type: str = "Trie"):
     return {
         "name": name,
         "index_type": index_type
     }
+
+def VectorIndex(index_type: str = "IVF_FLAT", metric_type: Optional[str] = None, expected_rows: Optional[int] = None, params: Optional[dict] = None):
+    return {
+        "index_type": index_type,
+        "metric_type": metric_type,
+        "expected_rows": expected_rows,
+        "params": params if params else {}
+    }
+
+def index_build_params(index_type: str, dimension: int, expected_rows: Optional[int] = None):
+    if index_type in ("IVF_FLAT", "IVF_SQ8", "IVF_PQ"):
+        # Rule of thumb: about 4 * sqrt(rows) clusters, so each cluster holds a few hundred vectors
+        nlist = int(4 * math.sqrt(expected_rows)) if expected_rows else 1024
+        params = {"nlist": min(max(nlist, 1), 65536)}
+        if index_type == "IVF_PQ":
+            params["m"] = next(m for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1) if dimension % m == 0)
+            params["nbits"] = 8
+        return params
+    if index_type == "HNSW":
+        return {"M": 16, "efConstruction": 200}
+    return {}
+
+def index_search_params(index_type: str, build_params: dict):
+    if index_type in ("IVF_FLAT", "IVF_SQ8", "IVF_PQ"):
+        nlist = build_params.get("nlist", 1024)
+        return {"nprobe": min(max(nlist // 32, 8), nlist)}
+    if index_type == "HNSW":
+        return {"ef": 64}
+    if index_type == "DISKANN":
+        return {"search_list": 100}
+    return {}
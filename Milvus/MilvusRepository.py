@@ -1,204 +1,1077 @@
+import re
+import time
+import zlib
 import asyncio
+import inspect
+import warnings
+import threading
+import numpy as np
+from collections import OrderedDict
 from sqlalchemy.exc import DataError
 from typing import Optional, Union, List, Dict, Any
-from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
+from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, Partition, AnnSearchRequest, RRFRanker, WeightedRanker, MilvusException, utility
 from Milvus.Embedder import Embedder
+from Milvus.MilvusExecutor import MilvusExecutor
+from Milvus.MilvusIndex import index_build_params, index_search_params
+from Milvus.SparseEncoder import SparseEncoder
+from Filter.Filter import Expression, UnindexedFieldWarning
+from Cache.ResultCache import ResultCache, freeze
+from Cache.SingleFlight import SingleFlight
+
+MATCH_ALL = "dalmeng_pydb_data_id != ''"
+FIND_BATCH_SIZE = 8192
+OUTPUTS = ("dict", "tuple", "array")
+RANKERS = ("rrf", "weighted")
+STRING_LITERAL = r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'"
+STRING_LIST = r"\[\s*(?:(?:{0})\s*(?:,\s*(?:{0})\s*)*)?\]".format(STRING_LITERAL)
+ESCAPES = {"\\": "\\", "'": "'", '"': '"'}
 
 class MilvusRepository:
-    def __init__(self, embedding_dimension: int, milvus_host: str = "127.0.0.1", milvus_port: int = 19530, metric_type: str = "COSINE", index_type: str = "IVF_FLAT", limit: int = 3, embedding_server_host: str = "127.0.0.1", embedding_server_port: int = 7777):
-        connections.connect(host=milvus_host, port=milvus_port)
-        self.__param = {
-            'metric_type': metric_type,
-            'index_type': index_type,
-            'params': {
-                "nlist": int(embedding_dimension)
-            }
-        }
+    def __init__(self, embedding_dimension: int, milvus_host: str = "127.0.0.1", milvus_port: int = 19530, metric_type: str = "COSINE", index_type: str = "IVF_FLAT", limit: int = 3, embedding_server_host: str = "127.0.0.1", embedding_server_port: int = 7777, embedder: Optional[Embedder] = None, normalize: bool = False, write_behind: bool = False, write_buffer_rows: int = 1000, write_buffer_interval_ms: Optional[float] = 1000, executor: Optional[MilvusExecutor] = None, expected_rows: Optional[int] = None, milvus_uri: Optional[str] = None, in_list_batch_size: int = 1000, result_cache: Optional[ResultCache] = None, single_flight: Optional[SingleFlight] = None):
+        if milvus_uri:
+            connections.connect(uri=milvus_uri)
+        else:
+            connections.connect(host=milvus_host, port=milvus_port)
+        self.__index_type = index_type
+        self.__expected_rows = expected_rows
         self.__limit = int(limit)
         self.__embedding_dimension = int(embedding_dimension)
         self.__metric_type = metric_type
+        self.__normalize = normalize
         self.__collections = {}
         self.__collections_metadata = {}
-        self.__embedder: Embedder = Embedder(
+        self.__embedder: Embedder = embedder if embedder else Embedder(
             embedding_ip=embedding_server_host,
-            embedding_port=embedding_server_port
+            embedding_port=embedding_server_port,
+            embedding_dimension=self.__embedding_dimension
         )
+        self.__write_behind = write_behind
+        self.__write_buffer_rows = int(write_buffer_rows)
+        self.__write_buffer_interval = float(write_buffer_interval_ms) / 1000 if write_buffer_interval_ms else None
+        self.__write_buffers = {}
+        self.__buffered_rows = {}
+        self.__drain_handles = {}
+        self.__drain_locks = {}
+        self.__drain_tasks = set()
+        self.__write_errors = {}
+        self.__owns_executor = executor is None
+        self.__loaded_partitions = {}
+        self.__partition_refs = {}
+        self.__partition_locks = {}
+        self.__in_list_batch_size = int(in_list_batch_size)
+        self.__unindexed_warned = set()
+        self.__result_cache = result_cache
+        self.__single_flight = single_flight
+        self.__generations = {}
+        self.__executor: MilvusExecutor = executor if executor else MilvusExecutor()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
-    def add_collection(self, collection_name: str, collection_fields: List[Dict[str, Any]], indexes: List[Dict[str, str]]):
+    async def aclose(self):
+        # Buffered rows that can not be written are reported after everything else is closed
+        errors = []
+        for collection in set(self.__write_buffers) | set(self.__write_errors):
+            try:
+                await self.__drain(collection)
+                self.__raise_write_error(collection)
+            except Exception as e:
+                errors.append(e)
+        # Vector fields may bring their own embedders, close each one once
+        embedders = {id(self.__embedder): self.__embedder}
+        for metadata in self.__collections_metadata.values():
+            for vector_field in metadata["vector_fields"].values():
+                embedders.setdefault(id(vector_field["embedder"]), vector_field["embedder"])
+        for embedder in embedders.values():
+            await embedder.aclose()
+        if self.__owns_executor:
+            self.__executor.shutdown(wait=False)
+        if errors:
+            raise errors[0]
+
+    async def flush(self, collection: Optional[str] = None):
+        collections = [collection] if collection else list(self.__collections)
+        for collection in collections:
+            await self.__drain(collection, seal=True)
+            self.__raise_write_error(collection)
+
+    async def add_collection_async(self, collection_name: str, collection_fields: List[Dict[str, Any]], indexes: List[Dict[str, str]], vector_index: Optional[Dict[str, Any]] = None, search_params: Optional[Dict[str, Any]] = None, num_partitions: Optional[int] = None, partition_field: Optional[str] = None, partitions: Optional[List[str]] = None, max_loaded_partitions: Optional[int] = None, sparse_encoder: Optional[SparseEncoder] = None):
+        await self.__executor.run("write", self.add_collection, collection_name, collection_fields, indexes, vector_index, search_params, num_partitions, partition_field, partitions, max_loaded_partitions, sparse_encoder)
+
+    def add_collection(self, collection_name: str, collection_fields: List[Dict[str, Any]], indexes: List[Dict[str, str]], vector_index: Optional[Dict[str, Any]] = None, search_params: Optional[Dict[str, Any]] = None, num_partitions: Optional[int] = None, partition_field: Optional[str] = None, partitions: Optional[List[str]] = None, max_loaded_partitions: Optional[int] = None, sparse_encoder: Optional[SparseEncoder] = None):
         vector_field_name = None
+        sparse_index_type = "SPARSE_INVERTED_INDEX"
+        partition_key = None
 
         self.__collections_metadata[collection_name] = {
             "vector_field": None,
-            "fields": []
+            "vector_fields": OrderedDict(),
+            "sparse_field": None,
+            "sparse_encoder": None,
+            "fields": [],
+            "schema_fields": ["dalmeng_pydb_data_id"],
+            "indexed_fields": {"dalmeng_pydb_data_id"},
+            "partition_field": None,
+            "partitions": set(),
+            "max_loaded_partitions": int(max_loaded_partitions) if max_loaded_partitions else None
         }
 
         fields = [FieldSchema(name="dalmeng_pydb_data_id", dtype=DataType.VARCHAR, is_primary=True, max_length=64)]
         for field in collection_fields:
             if field["type"] == "string":
                 fields.append(
-                    FieldSchema(name=field["name"], dtype=DataType.VARCHAR, max_length=field["max_length"])
+                    FieldSchema(name=field["name"], dtype=DataType.VARCHAR, max_length=field["max_length"], is_partition_key=field.get("partition_key", False))
                 )
+                if field.get("partition_key"):
+                    partition_key = field["name"]
+                    self.__collections_metadata[collection_name]["indexed_fields"].add(field["name"])
                 self.__collections_metadata[collection_name]["fields"].append(field["name"])
+                self.__collections_metadata[collection_name]["schema_fields"].append(field["name"])
             elif field["type"] == "vector":
+                dimension = int(field.get("dimension") or self.__embedding_dimension)
+                fields.append(
+                    FieldSchema(name=field["name"], dtype=DataType.FLOAT_VECTOR, dim=dimension)
+                )
+                # The first vector field is the default target of retrieval
+                if not vector_field_name:
+                    vector_field_name = field["name"]
+                    self.__collections_metadata[collection_name]["vector_field"] = field["name"]
+                self.__collections_metadata[collection_name]["vector_fields"][field["name"]] = {
+                    "dimension": dimension,
+                    "embedder": field.get("embedder") or self.__embedder,
+                    "metric_type": field.get("metric_type"),
+                    "vector_index": field.get("vector_index")
+                }
+                self.__collections_metadata[collection_name]["schema_fields"].append(field["name"])
+            elif field["type"] == "sparse_vector":
+                if self.__collections_metadata[collection_name]["sparse_field"]:
+                    raise ValueError("To add a collection, only one sparse vector field is allowed.")
                 fields.append(
-                    FieldSchema(name=field["name"], dtype=DataType.FLOAT_VECTOR, dim=self.__embedding_dimension)
+                    FieldSchema(name=field["name"], dtype=DataType.SPARSE_FLOAT_VECTOR)
                 )
-                vector_field_name = field["name"]
-                self.__collections_metadata[collection_name]["vector_field"] = field["name"]
+                self.__collections_metadata[collection_name]["sparse_field"] = field["name"]
+                self.__collections_metadata[collection_name]["sparse_encoder"] = sparse_encoder if sparse_encoder else SparseEncoder()
+                self.__collections_metadata[collection_name]["schema_fields"].append(field["name"])
 
         if not vector_field_name:
             raise ValueError("Vector Field must exist.")
+        if partition_field and partition_field not in self.__collections_metadata[collection_name]["fields"]:
+            raise ValueError("To partition a collection, partition_field must be a string field of the collection.")
+        if partition_field and partition_key:
+            raise ValueError("To partition a collection, use either a partition key field or partition_field, not both.")
 
         collection = Collection(
             name=collection_name,
             schema=CollectionSchema(
                 fields=fields
             ),
+            **({"num_partitions": int(num_partitions)} if partition_key and num_partitions else {})
         )
 
         if collection_name not in self.__collections:
             self.__collections[collection_name] = collection
+
+        if partition_field:
+            self.__collections_metadata[collection_name]["partition_field"] = partition_field
+            self.__collections_metadata[collection_name]["indexed_fields"].add(partition_field)
+            self.__collections_metadata[collection_name]["partitions"] = set(
+                partition.name for partition in self.__collections[collection_name].partitions if partition.name != "_default"
+            )
+            self.__loaded_partitions[collection_name] = OrderedDict()
+            self.__partition_refs[collection_name] = {}
+            self.__partition_locks[collection_name] = threading.Lock()
+            for value in partitions if partitions else []:
+                self.__create_partition(collection_name, partition_name(value))
         
+        vector_indexes = {}
         for index in indexes:
-            index_params = {"index_type": index["index_type"]}
-            if index["name"] == vector_field_name:
-                index_params["metric_type"] = self.__metric_type
-                vector_field_name = None
+            if index["name"] in self.__collections_metadata[collection_name]["vector_fields"]:
+                vector_indexes[index["name"]] = {"index_type": index["index_type"]}
+                continue
+            if index["name"] == self.__collections_metadata[collection_name]["sparse_field"]:
+                sparse_index_type = index["index_type"]
+                continue
             
             self.__collections[collection_name].create_index(
                 field_name=index["name"],
-                index_params=index_params
+                index_params={"index_type": index["index_type"]}
             )
+            self.__collections_metadata[collection_name]["indexed_fields"].add(index["name"])
 
-        if vector_field_name:
+        for name, vector_field in self.__collections_metadata[collection_name]["vector_fields"].items():
+            # The field's own index wins over the collection-wide one, then over Index(...) entries and the repository default
+            index = vector_field.pop("vector_index") or vector_index or vector_indexes.get(name) or {"index_type": self.__index_type}
+            vector_index_params = {
+                "metric_type": vector_field["metric_type"] or index.get("metric_type") or self.__metric_type,
+                "index_type": index["index_type"],
+                "params": {
+                    **index_build_params(index["index_type"], vector_field["dimension"], index.get("expected_rows") or self.__expected_rows),
+                    **index.get("params", {})
+                }
+            }
             self.__collections[collection_name].create_index(
-                field_name=vector_field_name,
-                index_params=self.__param
+                field_name=name,
+                index_params=vector_index_params
             )
-        self.__collections[collection_name].load()
+            vector_field["metric_type"] = vector_index_params["metric_type"]
+            vector_field["normalize"] = self.__normalize and vector_field["metric_type"] in ("COSINE", "IP")
+            vector_field["search_param"] = {
+                "metric_type": vector_index_params["metric_type"],
+                "params": {
+                    **index_search_params(vector_index_params["index_type"], vector_index_params["params"]),
+                    **(search_params if search_params else {})
+                }
+            }
+        if self.__collections_metadata[collection_name]["sparse_field"]:
+            self.__collections[collection_name].create_index(
+                field_name=self.__collections_metadata[collection_name]["sparse_field"],
+                index_params={"index_type": sparse_index_type, "metric_type": "IP", "params": {"drop_ratio_build": 0.0}}
+            )
+        # Explicit partitions are loaded when a read first touches them
+        if not partition_field:
+            self.__collections[collection_name].load()
+
+    def __filters(self, collection: str, filter: Optional[Union[str, Expression]], batch: bool = False):
+        if filter is None or filter == MATCH_ALL:
+            return [None]
+        if not isinstance(filter, Expression):
+            return [filter]
+
+        metadata = self.__collections_metadata[collection]
+        for field in filter.fields():
+            if field != "dalmeng_pydb_data_id" and field not in metadata["fields"]:
+                raise ValueError("To filter data, '{}' must be a scalar field of the collection.".format(field))
+            if field not in metadata["indexed_fields"] and (collection, field) not in self.__unindexed_warned:
+                self.__unindexed_warned.add((collection, field))
+                warnings.warn("Filter on unindexed field '{}' of collection '{}' scans every row.".format(field, collection), UnindexedFieldWarning, stacklevel=3)
+
+        # An empty "in" list never reaches Milvus, a filter that matches nothing is passed on as False
+        filter = filter.folded()
+        if filter is True:
+            return [None]
+        if filter is False:
+            return [False]
+        # Expressions stay uncompiled until the Milvus call, so partition pruning can read their tree
+        return filter.batches(self.__in_list_batch_size) if batch else [filter]
+
+    def __create_partition(self, collection: str, name: str):
+        if name in self.__collections_metadata[collection]["partitions"]:
+            return
+        with self.__partition_locks[collection]:
+            if name not in self.__collections_metadata[collection]["partitions"]:
+                if not self.__collections[collection].has_partition(name):
+                    self.__collections[collection].create_partition(name)
+                # Replace instead of mutate, readers on other threads keep iterating their own copy
+                self.__collections_metadata[collection]["partitions"] = self.__collections_metadata[collection]["partitions"] | {name}
+
+    def __partitions(self, collection: str, filter: Optional[Union[str, Expression]]):
+        # No partition is read for a filter that matches nothing
+        if filter is False:
+            return []
+        if not self.__collections_metadata[collection].get("partition_field"):
+            return None
+        pinned = self.__pinned_partitions(collection, filter)
+        return pinned if pinned is not None else self.__refresh_partitions(collection)
+
+    def __pinned_partitions(self, collection: str, filter: Optional[Union[str, Expression]]):
+        partition_field = self.__collections_metadata[collection].get("partition_field")
+        values = pinned_values(filter, partition_field) if partition_field else None
+        if values is None:
+            return None
+        return sorted(name for name in set(partition_name(value) for value in values) if self.__has_partition(collection, name))
+
+    def __has_partition(self, collection: str, name: str):
+        # Another worker may have created the partition since this one last looked
+        if name in self.__collections_metadata[collection]["partitions"]:
+            return True
+        if not self.__collections[collection].has_partition(name):
+            return False
+        with self.__partition_locks[collection]:
+            self.__collections_metadata[collection]["partitions"] = self.__collections_metadata[collection]["partitions"] | {name}
+        return True
+
+    def __refresh_partitions(self, collection: str):
+        names = set(partition.name for partition in self.__collections[collection].partitions if partition.name != "_default")
+        with self.__partition_locks[collection]:
+            self.__collections_metadata[collection]["partitions"] = self.__collections_metadata[collection]["partitions"] | names
+            return sorted(self.__collections_metadata[collection]["partitions"])
+
+    def __acquire_partitions(self, collection: str, names: Optional[List[str]]):
+        if names is None:
+            return
+        with self.__partition_locks[collection]:
+            loaded = self.__loaded_partitions[collection]
+            refs = self.__partition_refs[collection]
+            missing = [name for name in names if name not in loaded]
+            if missing:
+                self.__collections[collection].load(partition_names=missing)
+            for name in names:
+                loaded[name] = True
+                loaded.move_to_end(name)
+                refs[name] = refs.get(name, 0) + 1
+            self.__evict_partitions(collection)
+
+    def __release_partitions(self, collection: str, names: Optional[List[str]]):
+        if names is None:
+            return
+        with self.__partition_locks[collection]:
+            refs = self.__partition_refs[collection]
+            for name in names:
+                refs[name] -= 1
+                if not refs[name]:
+                    del refs[name]
+            self.__evict_partitions(collection)
+
+    def __retry_unloaded(self, collection: str, names: Optional[List[str]], call):
+        # Loaded partitions are tracked per process, another client of the server may have released one this process still counts as loaded
+        try:
+            return call()
+        except MilvusException as e:
+            if names is None or "not loaded" not in str(e).lower():
+                raise
+        with self.__partition_locks[collection]:
+            self.__collections[collection].load(partition_names=names)
+        return call()
+
+    def __evict_partitions(self, collection: str):
+        # Release least recently used partitions that no running call is reading
+        max_loaded = self.__collections_metadata[collection]["max_loaded_partitions"]
+        loaded = self.__loaded_partitions[collection]
+        if not max_loaded or len(loaded) <= max_loaded:
+            return
+        for name in list(loaded):
+            if len(loaded) <= max_loaded:
+                break
+            if name not in self.__partition_refs[collection]:
+                Partition(self.__collections[collection], name, construct_only=True).release()
+                del loaded[name]
 
     async def clear_collections(self, collection_names: Optional[Union[str | list]] = None):
         if not collection_names:
-            collection_names = utility.list_collections()
+            collection_names = await self.__executor.run("write", utility.list_collections)
             for collection_name in collection_names:
-                utility.drop_collection(collection_name)
+                self.__discard_buffer(collection_name)
+                await self.__executor.run("write", utility.drop_collection, collection_name)
+                self.__invalidate(collection_name)
             return
         
         if isinstance(collection_names, str):
             collection_names = [collection_names]
         for collection_name in collection_names:
-            if utility.has_collection(collection_name): utility.drop_collection(collection_name)
+            self.__discard_buffer(collection_name)
+            await self.__executor.run("write", self.__drop_collection, collection_name)
+            self.__invalidate(collection_name)
+
+    def __drop_collection(self, collection_name: str):
+        if utility.has_collection(collection_name): utility.drop_collection(collection_name)
+        if collection_name in self.__loaded_partitions:
+            self.__loaded_partitions[collection_name].clear()
+            self.__partition_refs[collection_name].clear()
+            self.__collections_metadata[collection_name]["partitions"] = set()
     
-    async def retrieval(self, collection: str, text: str, filter: str = "dalmeng_pydb_data_id != ''", limit: int = None):
-        embedded_vector = await self.__embedder.encode(message=text)
-        
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None, self.__retrieval, collection, embedded_vector, filter, limit
-        )
+    async def retrieval(self, collection: str, text: str, filter: Optional[Union[str, Expression]] = None, limit: int = None, consistency_level: Optional[str] = None, search_params: Optional[Dict[str, Any]] = None, fields: Optional[List[str]] = None, output: str = "dict", with_score: bool = False, min_score: Optional[float] = None, radius: Optional[float] = None, vector_field: Optional[Union[str, List[str]]] = None, ranker: str = "rrf", rrf_k: int = 60, weights: Optional[List[float]] = None):
+        vector_fields = self.__vector_fields(collection, vector_field)
+        filter = self.__filters(collection, filter)[0]
+        fields = self.__output_fields(collection, fields, output)
+        search_params = self.__range(collection, vector_fields, search_params, min_score, radius)
+        key = ("retrieval", text, filter, limit, search_params, fields, output, with_score, vector_fields, ranker, rrf_k, weights)
+
+        async def read():
+            if len(vector_fields) > 1:
+                # Several vector fields are searched in one multi-vector request and fused on the server
+                return await self.__fused_retrieval(collection, text, vector_fields, False, filter, limit, ranker, rrf_k, weights, None, consistency_level, search_params, fields, output, with_score)
 
-    def __retrieval(self, collection: str, embedded_vector, filter: str, limit: int):
+            embedded_vector = await self.__embed(collection, vector_fields[0], [text])
+            await self.__read_your_writes(collection, consistency_level)
+            
+            result = await self.__executor.run(
+                "read", self.__retrieval, collection, vector_fields[0], embedded_vector, filter, limit, consistency_level, search_params, fields, output, with_score
+            )
+            return result[0]
+
+        return await self.__read(collection, key, consistency_level, read)
+
+    async def retrieval_many(self, collection: str, texts: List[str], filter: Optional[Union[str, Expression]] = None, limit: int = None, consistency_level: Optional[str] = None, search_params: Optional[Dict[str, Any]] = None, fields: Optional[List[str]] = None, output: str = "dict", with_score: bool = False, min_score: Optional[float] = None, radius: Optional[float] = None, vector_field: Optional[str] = None):
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise ValueError("To retrieve multiple queries, texts type must be list containing string.")
+        if vector_field is not None and not isinstance(vector_field, str):
+            raise ValueError("To retrieve multiple queries, vector_field type must be string.")
+        vector_fields = self.__vector_fields(collection, vector_field)
+        if not texts:
+            return []
+        filter = self.__filters(collection, filter)[0]
+        fields = self.__output_fields(collection, fields, output)
+        search_params = self.__range(collection, vector_fields, search_params, min_score, radius)
+        key = ("retrieval_many", texts, filter, limit, search_params, fields, output, with_score, vector_fields)
+
+        async def read():
+            embedded_vectors = await self.__embed(collection, vector_fields[0], texts)
+            await self.__read_your_writes(collection, consistency_level)
+
+            return await self.__executor.run(
+                "read", self.__retrieval, collection, vector_fields[0], embedded_vectors, filter, limit, consistency_level, search_params, fields, output, with_score
+            )
+
+        return await self.__read(collection, key, consistency_level, read)
+
+    def __retrieval(self, collection: str, vector_field: str, embedded_vectors, filter: Optional[str], limit: int, consistency_level: Optional[str] = None, search_params: Optional[Dict[str, Any]] = None, fields: Optional[List[str]] = None, output: str = "dict", with_score: bool = False):
         limit = limit if limit else self.__limit
-        retrieval_result = self.__collections[collection].search(
-            data=[embedded_vector],
-            anns_field=self.__collections_metadata[collection]["vector_field"],
-            param=self.__param,
-            limit=limit,
-            output_fields=self.__collections_metadata[collection]["fields"],
-            expr=filter
-        )
+        param = self.__search_param(collection, vector_field, limit, search_params)
+        fields = fields if fields is not None else self.__collections_metadata[collection]["fields"]
+        partition_names = self.__partitions(collection, filter)
+        if partition_names == []:
+            return [materialize([], fields, output, with_score) for _ in range(len(embedded_vectors))]
 
-        result = []
-        for hits in retrieval_result:
-            for hit in hits:
-                result.append(hit.to_dict()["entity"])
-        
-        return result
+        self.__acquire_partitions(collection, partition_names)
+        try:
+            retrieval_result = self.__retry_unloaded(collection, partition_names, lambda: self.__collections[collection].search(
+                data=embedded_vectors,
+                anns_field=vector_field,
+                param=param,
+                limit=limit,
+                output_fields=fields,
+                expr=milvus_expression(filter),
+                **partition(partition_names),
+                **consistency(consistency_level)
+            ))
+        finally:
+            self.__release_partitions(collection, partition_names)
+
+        return [materialize(hits, fields, output, with_score) for hits in retrieval_result]
+
+    async def hybrid_retrieval(self, collection: str, text: str, filter: Optional[Union[str, Expression]] = None, limit: int = None, ranker: str = "rrf", rrf_k: int = 60, weights: Optional[List[float]] = None, candidates: Optional[int] = None, consistency_level: Optional[str] = None, search_params: Optional[Dict[str, Any]] = None, fields: Optional[List[str]] = None, output: str = "dict", with_score: bool = False, vector_field: Optional[Union[str, List[str]]] = None):
+        if not self.__collections_metadata[collection]["sparse_field"]:
+            raise ValueError("To run a hybrid retrieval, collection must have a sparse vector field.")
+        vector_fields = self.__vector_fields(collection, vector_field)
+        filter = self.__filters(collection, filter)[0]
+        fields = self.__output_fields(collection, fields, output)
+        key = ("hybrid_retrieval", text, filter, limit, ranker, rrf_k, weights, candidates, search_params, fields, output, with_score, vector_fields)
+
+        async def read():
+            return await self.__fused_retrieval(collection, text, vector_fields, True, filter, limit, ranker, rrf_k, weights, candidates, consistency_level, search_params, fields, output, with_score)
+
+        return await self.__read(collection, key, consistency_level, read)
+
+    async def __fused_retrieval(self, collection: str, text: str, vector_fields: List[str], sparse: bool, filter: Optional[str], limit: int, ranker: str, rrf_k: int, weights: Optional[List[float]], candidates: Optional[int], consistency_level: Optional[str], search_params: Optional[Dict[str, Any]], fields: Optional[List[str]], output: str, with_score: bool):
+        requests = len(vector_fields) + (1 if sparse else 0)
+        if ranker not in RANKERS:
+            raise ValueError("Ranker must be one of {}.".format(", ".join(RANKERS)))
+        if weights is not None and len(weights) != requests:
+            raise ValueError("To fuse with weights, weights must have one weight per searched vector field (dense fields first, then sparse).")
 
-    async def find(self, collection: str, filter: str = "dalmeng_pydb_data_id != ''", find_one=False):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, self.__find, collection, filter
+        embedded_vectors = await asyncio.gather(*[self.__embed(collection, name, [text]) for name in vector_fields])
+        queries = list(zip(vector_fields, embedded_vectors))
+        if sparse:
+            queries.append((self.__collections_metadata[collection]["sparse_field"], self.__collections_metadata[collection]["sparse_encoder"].encode_queries([text])))
+        await self.__read_your_writes(collection, consistency_level)
+
+        rerank = RRFRanker(int(rrf_k)) if ranker == "rrf" else WeightedRanker(*(weights if weights else [1 / requests] * requests))
+        result = await self.__executor.run(
+            "read", self.__hybrid_retrieval, collection, queries, filter, limit, candidates, rerank, consistency_level, search_params, fields, output, with_score
         )
-        
+        return result[0]
+
+    def __hybrid_retrieval(self, collection: str, queries: list, filter: Optional[str], limit: int, candidates: Optional[int], rerank, consistency_level: Optional[str] = None, search_params: Optional[Dict[str, Any]] = None, fields: Optional[List[str]] = None, output: str = "dict", with_score: bool = False):
+        limit = limit if limit else self.__limit
+        candidates = max(int(candidates), limit) if candidates else limit
+        fields = fields if fields is not None else self.__collections_metadata[collection]["fields"]
+        partition_names = self.__partitions(collection, filter)
+        if partition_names == []:
+            return [materialize([], fields, output, with_score)]
+
+        # All ANN requests run in one Milvus call and are fused on the server
+        requests = [
+            AnnSearchRequest(
+                data=vectors,
+                anns_field=name,
+                param={"metric_type": "IP", "params": {"drop_ratio_search": 0.0}} if name == self.__collections_metadata[collection]["sparse_field"] else self.__search_param(collection, name, candidates, search_params),
+                limit=candidates,
+                expr=milvus_expression(filter)
+            )
+            for name, vectors in queries
+        ]
+        self.__acquire_partitions(collection, partition_names)
+        try:
+            retrieval_result = self.__retry_unloaded(collection, partition_names, lambda: self.__collections[collection].hybrid_search(
+                reqs=requests,
+                rerank=rerank,
+                limit=limit,
+                output_fields=fields,
+                **partition(partition_names),
+                **consistency(consistency_level)
+            ))
+        finally:
+            self.__release_partitions(collection, partition_names)
+
+        return [materialize(hits, fields, output, with_score) for hits in retrieval_result]
+
+    def __range(self, collection: str, vector_fields: List[str], search_params: Optional[Dict[str, Any]], min_score: Optional[float], radius: Optional[float]):
+        if min_score is None and radius is None:
+            return search_params
+        if min_score is not None and radius is not None:
+            raise ValueError("To search by range, give either min_score or radius.")
+        if min_score is not None:
+            if any(self.__collections_metadata[collection]["vector_fields"][name]["metric_type"] not in ("COSINE", "IP") for name in vector_fields):
+                raise ValueError("To search with min_score, metric type must be COSINE or IP (use radius for L2).")
+            radius = min_score
+        # Milvus range search drops hits beyond the radius before they leave the query node
+        return {**(search_params if search_params else {}), "radius": float(radius)}
+
+    def __output_fields(self, collection: str, fields: Optional[List[str]], output: str = "dict"):
+        if output not in OUTPUTS:
+            raise ValueError("Output must be one of {}.".format(", ".join(OUTPUTS)))
+        if fields is None:
+            return None
+        if not isinstance(fields, list) or not all(field in self.__collections_metadata[collection]["fields"] for field in fields):
+            raise ValueError("To project fields, fields type must be list containing scalar field names of the collection.")
+        return fields
+
+    def __vector_fields(self, collection: str, vector_field: Optional[Union[str, List[str]]]):
+        vector_fields = self.__collections_metadata[collection]["vector_fields"]
+        if vector_field is None:
+            return [self.__collections_metadata[collection]["vector_field"]]
+        names = [vector_field] if isinstance(vector_field, str) else vector_field
+        if not isinstance(names, list) or not names or not all(name in vector_fields for name in names):
+            raise ValueError("To retrieve data, vector_field must be a vector field name of the collection or a list of them.")
+        return list(dict.fromkeys(names))
+
+    def __search_param(self, collection: str, vector_field: str, limit: int, search_params: Optional[Dict[str, Any]] = None):
+        default = self.__collections_metadata[collection]["vector_fields"][vector_field]["search_param"]
+        params = {**default["params"], **(search_params if search_params else {})}
+        # HNSW rejects ef below top-k
+        if "ef" in params and params["ef"] < limit:
+            params["ef"] = limit
+        return {"metric_type": default["metric_type"], "params": params}
+
+    async def find(self, collection: str, filter: Optional[Union[str, Expression]] = None, find_one=False, consistency_level: Optional[str] = None, limit: Optional[int] = None, offset: Optional[int] = None, fields: Optional[List[str]] = None):
+        if offset and not limit:
+            raise ValueError("To find data with offset, limit must be given.")
         if find_one:
-            if not len(result): 
-                return None
-            if "dalmeng_pydb_data_id" in result[0]:
-                del result[0]["dalmeng_pydb_data_id"]
-            return result[0]
-        
-        ret = []
-        for i in result:
-            if "dalmeng_pydb_data_id" in i:
-                del i["dalmeng_pydb_data_id"]
-            ret.append(i)
-        
-        return ret
+            limit = 1
+        # Batches of a long "in" list are disjoint, so they can run side by side unless the result is paged
+        filters = self.__filters(collection, filter, batch=not limit)
+        fields = self.__output_fields(collection, fields)
+        key = ("find", filters, find_one, limit, offset, fields)
 
-    def __find(self, collection: str, filter: str):
-        result = self.__collections[collection].query(
-            expr=filter, 
-            output_fields=self.__collections_metadata[collection]["fields"]
-        )
+        async def read():
+            results = await asyncio.gather(*[
+                self.__executor.run("read", self.__find, collection, filter, consistency_level, limit, offset, fields)
+                for filter in filters
+            ])
+            result = [row for rows in results for row in rows]
+            
+            if find_one:
+                if not len(result): 
+                    return None
+                if "dalmeng_pydb_data_id" in result[0]:
+                    del result[0]["dalmeng_pydb_data_id"]
+                return result[0]
+            
+            ret = []
+            for i in result:
+                if "dalmeng_pydb_data_id" in i:
+                    del i["dalmeng_pydb_data_id"]
+                ret.append(i)
+            
+            return ret
+
+        return await self.__read(collection, key, consistency_level, read)
+
+    async def __read(self, collection: str, key: tuple, consistency_level: Optional[str], read):
+        # Buffered writes are sent (and invalidate the cache) before a read-your-writes lookup
+        await self.__read_your_writes(collection, consistency_level)
+        # Strong reads must also see writes of other clients, they always go to Milvus on their own
+        if consistency_level == "Strong":
+            return await read()
+
+        key = (id(self), freeze(key))
+        if self.__result_cache is not None:
+            generation = self.__result_cache.generation(collection)
+            result = self.__result_cache.get(collection, key)
+            if result is not None:
+                return result
+
+        if self.__single_flight is not None:
+            # A read issued after a write of this repository never joins a read started before it
+            result = await self.__single_flight.run((collection, self.__generations.get(collection, 0), consistency_level, key), read)
+        else:
+            result = await read()
+
+        if self.__result_cache is not None:
+            self.__result_cache.put(collection, key, result, generation)
         return result
 
-    async def insert(self, collection: str, text: str | list, data: list | dict, insert_one=True):
+    def __invalidate(self, collection: str):
+        self.__generations[collection] = self.__generations.get(collection, 0) + 1
+        if self.__result_cache is not None:
+            self.__result_cache.invalidate(collection)
+
+    def __find(self, collection: str, filter: str, consistency_level: Optional[str] = None, limit: Optional[int] = None, offset: Optional[int] = None, fields: Optional[List[str]] = None):
+        fields = fields if fields is not None else self.__collections_metadata[collection]["fields"]
+        page = {}
+        if limit:
+            page["limit"] = int(limit)
+        if offset:
+            page["offset"] = int(offset)
+        partition_names = self.__partitions(collection, filter)
+        if partition_names == []:
+            return []
+
+        self.__acquire_partitions(collection, partition_names)
+        try:
+            if filter or limit:
+                return self.__retry_unloaded(collection, partition_names, lambda: self.__collections[collection].query(
+                    expr=milvus_expression(filter) if filter else "",
+                    output_fields=fields,
+                    **partition(partition_names),
+                    **consistency(consistency_level),
+                    **page
+                ))
+
+            # Milvus only accepts an empty expression with a limit, so read everything with an iterator instead of a match-all filter
+            iterator = self.__retry_unloaded(collection, partition_names, lambda: self.__collections[collection].query_iterator(
+                batch_size=FIND_BATCH_SIZE,
+                expr="",
+                output_fields=fields,
+                **partition(partition_names),
+                **consistency(consistency_level)
+            ))
+            result = []
+            try:
+                while rows := self.__retry_unloaded(collection, partition_names, iterator.next):
+                    result.extend(rows)
+            finally:
+                iterator.close()
+            return result
+        finally:
+            self.__release_partitions(collection, partition_names)
+
+    async def iter_find(self, collection: str, filter: Optional[Union[str, Expression]] = None, batch_size: int = 1000, consistency_level: Optional[str] = None):
+        filters = self.__filters(collection, filter, batch=True)
+        await self.__read_your_writes(collection, consistency_level)
+
+        for filter in filters:
+            async for rows in self.__iter_batches(collection, filter, batch_size, self.__collections_metadata[collection]["fields"], consistency_level):
+                for row in rows:
+                    if "dalmeng_pydb_data_id" in row:
+                        del row["dalmeng_pydb_data_id"]
+                    yield row
+
+    async def __iter_batches(self, collection: str, filter: Optional[Union[str, Expression]], batch_size: int, output_fields: List[str], consistency_level: Optional[str] = None):
+        partition_names = await self.__executor.run("read", self.__partitions, collection, filter)
+        if partition_names == []:
+            return
+
+        iterator = await self.__executor.run(
+            "read", self.__query_iterator, collection, filter, batch_size, output_fields, consistency_level, partition_names
+        )
+        try:
+            while True:
+                rows = await self.__executor.run("read", self.__retry_unloaded, collection, partition_names, iterator.next)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await self.__executor.run("read", self.__close_iterator, collection, iterator, partition_names, shed=False)
+
+    def __query_iterator(self, collection: str, filter: Optional[str], batch_size: int, output_fields: List[str], consistency_level: Optional[str] = None, partition_names: Optional[List[str]] = None):
+        # Partitions stay acquired until the iterator is closed
+        self.__acquire_partitions(collection, partition_names)
+        try:
+            return self.__retry_unloaded(collection, partition_names, lambda: self.__collections[collection].query_iterator(
+                batch_size=int(batch_size),
+                expr=milvus_expression(filter) if filter else "",
+                output_fields=output_fields,
+                **partition(partition_names),
+                **consistency(consistency_level)
+            ))
+        except BaseException:
+            self.__release_partitions(collection, partition_names)
+            raise
+
+    def __close_iterator(self, collection: str, iterator, partition_names: Optional[List[str]]):
+        try:
+            iterator.close()
+        finally:
+            self.__release_partitions(collection, partition_names)
+
+    async def insert(self, collection: str, text: str | dict | list, data: list | dict, insert_one=True, progress=None):
         if insert_one:
             if not isinstance(data, dict):
                 raise ValueError("To insert single data, data type must be dictionary.")
-            if not isinstance(text, str):
-                raise ValueError("To insert single data, text type must be string.")
-            
-            embedded_vector = await self.__embedder.encode(text)
-            data["dalmeng_pydb_data_id"] = random_id()
-            data[self.__collections_metadata[collection]["vector_field"]] = embedded_vector
-            
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self.__insert, collection, data)
+            if not isinstance(text, (str, dict)):
+                raise ValueError("To insert single data, text type must be string or dictionary.")
             
-            if "dalmeng_pydb_data_id" in data:
-                del data["dalmeng_pydb_data_id"]
-            if self.__collections_metadata[collection]["vector_field"] in data:
-                del data[self.__collections_metadata[collection]["vector_field"]]
+            texts = self.__texts(collection, [text])
+            embedded_vectors = await self.__embed_all(collection, texts)
+
+            await self.__write(collection, self.__columns(collection, [data], embedded_vectors, texts))
             return data
         
         if not isinstance(data, list) or not all(isinstance(d, dict) for d in data):
             raise ValueError("To insert multiple data, data type must be list containing dictionary.")
-        if not isinstance(text, list) or not all(isinstance(d, str) for d in text) or len(data) != len(text):
-            raise ValueError("To insert multiple data, text type must be list containing string, and its length must be equal to data list.")
+        if not isinstance(text, list) or not all(isinstance(d, (str, dict)) for d in text) or len(data) != len(text):
+            raise ValueError("To insert multiple data, text type must be list containing string or dictionary, and its length must be equal to data list.")
         
-        embedded_vectors = await self.__embedder.encode(text)
+        texts = self.__texts(collection, text)
+        embedded_vectors = await self.__embed_all(collection, texts, progress=progress)
 
-        for i in range(len(embedded_vectors)):
-            data[i]["dalmeng_pydb_data_id"] = random_id()
-            data[i][self.__collections_metadata[collection]["vector_field"]] = embedded_vectors[i]
+        await self.__write(collection, self.__columns(collection, data, embedded_vectors, texts))
 
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self.__insert, collection, data)
+        return data
 
-        for i in range(len(embedded_vectors)):
-            if "dalmeng_pydb_data_id" in data[i]:
-                del data[i]["dalmeng_pydb_data_id"]
-            if self.__collections_metadata[collection]["vector_field"] in data[i]:
-                del data[i][self.__collections_metadata[collection]["vector_field"]]
+    async def ingest(self, collection: str, source, batch_size: int = 512, max_pending_batches: int = 2, progress=None):
+        batch_size = int(batch_size)
+        embed_queue = asyncio.Queue(maxsize=int(max_pending_batches))
+        write_queue = asyncio.Queue(maxsize=int(max_pending_batches))
+        stats = {"rows": 0, "seconds": 0.0, "rows_per_second": 0.0}
+        started = time.monotonic()
 
-        return data
+        async def read():
+            texts, records = [], []
+            async for text, record in iterate(source):
+                if not isinstance(text, (str, dict)) or not isinstance(record, dict):
+                    raise ValueError("To ingest data, source must yield (string or dictionary, dictionary) pairs.")
+                texts.append(text)
+                records.append(record)
+                if len(texts) >= batch_size:
+                    await embed_queue.put((texts, records))
+                    texts, records = [], []
+            if texts:
+                await embed_queue.put((texts, records))
+            await embed_queue.put(None)
 
-    def __insert(self, collection: str, data: dict | list):
-        self.__collections[collection].insert(data)
-        self.__collections[collection].flush()
+        async def embed():
+            while (batch := await embed_queue.get()) is not None:
+                texts, records = batch
+                texts = self.__texts(collection, texts)
+                embedded_vectors = await self.__embed_all(collection, texts)
+                await write_queue.put(self.__columns(collection, records, embedded_vectors, texts))
+            await write_queue.put(None)
 
-    async def delete(self, collection: str, filter: str = "dalmeng_pydb_data_id != ''"):
-        result = await self.find(collection=collection, filter=filter)
-        
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self.__delete, collection, filter)
-        
-        return result
+        async def write():
+            while (columns := await write_queue.get()) is not None:
+                if self.__write_behind:
+                    await self.__write(collection, columns)
+                else:
+                    await self.__executor.run("write", self.__insert, collection, columns, False)
+                    self.__invalidate(collection)
+
+                stats["rows"] += len(columns[0])
+                stats["seconds"] = time.monotonic() - started
+                stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+                if progress:
+                    reported = progress(dict(stats))
+                    if inspect.isawaitable(reported):
+                        await reported
+
+        tasks = [asyncio.ensure_future(stage()) for stage in (read, embed, write)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if not self.__write_behind:
+            await self.flush(collection)
+        stats["seconds"] = time.monotonic() - started
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
+
+    def __texts(self, collection: str, texts: list):
+        # A string embeds into every vector field, a dictionary gives each vector field its own text
+        metadata = self.__collections_metadata[collection]
+        names = list(metadata["vector_fields"]) + ([metadata["sparse_field"]] if metadata["sparse_field"] else [])
+        columns = {name: [] for name in names}
+        for text in texts:
+            for name in names:
+                if isinstance(text, str):
+                    value = text
+                elif name == metadata["sparse_field"]:
+                    value = text.get(name, text.get(metadata["vector_field"]))
+                else:
+                    value = text.get(name)
+                if not isinstance(value, str):
+                    raise ValueError("To insert data, text dictionary must have a string for every vector field.")
+                columns[name].append(value)
+        return columns
+
+    async def __embed(self, collection: str, vector_field: str, texts: List[str], progress=None):
+        vector_field = self.__collections_metadata[collection]["vector_fields"][vector_field]
+        # A single text goes through as a string so that concurrent single calls can be coalesced by the embedder
+        message = texts[0] if len(texts) == 1 else texts
+        return self.__as_matrix(await vector_field["embedder"].encode(message, progress=progress), vector_field["normalize"])
+
+    async def __embed_all(self, collection: str, texts: Dict[str, List[str]], progress=None):
+        metadata = self.__collections_metadata[collection]
+        names = list(metadata["vector_fields"])
+        embedded_vectors = await asyncio.gather(*[
+            self.__embed(collection, name, texts[name], progress if name == metadata["vector_field"] else None) for name in names
+        ])
+        return dict(zip(names, embedded_vectors))
+
+    def __as_matrix(self, embedded_vectors, normalize: bool = False):
+        # One contiguous float32 (rows, dimension) array, no per-row lists
+        matrix = np.ascontiguousarray(embedded_vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            matrix = matrix / norms
+        return matrix
+
+    def __columns(self, collection: str, data: list, embedded_vectors: Dict[str, np.ndarray], texts: Dict[str, List[str]]):
+        columns = []
+        for name in self.__collections_metadata[collection]["schema_fields"]:
+            if name == "dalmeng_pydb_data_id":
+                columns.append([random_id() for _ in range(len(data))])
+            elif name in embedded_vectors:
+                columns.append(embedded_vectors[name])
+            elif name == self.__collections_metadata[collection]["sparse_field"]:
+                columns.append(self.__collections_metadata[collection]["sparse_encoder"].encode_documents(texts[name]))
+            else:
+                columns.append([d[name] for d in data])
+        return columns
+
+    async def __write(self, collection: str, columns: list):
+        if not self.__write_behind:
+            await self.__executor.run("write", self.__insert, collection, columns)
+            self.__invalidate(collection)
+            return
+
+        self.__raise_write_error(collection)
+        self.__write_buffers.setdefault(collection, []).append(columns)
+        self.__buffered_rows[collection] = self.__buffered_rows.get(collection, 0) + len(columns[0])
+
+        if self.__buffered_rows[collection] >= self.__write_buffer_rows:
+            # The caller that fills the buffer waits for the drain, which keeps ingest backpressured
+            try:
+                await self.__drain(collection)
+            except Exception as e:
+                # The rows of this call are buffered already, the next write, flush or close reports the failure
+                self.__write_errors[collection] = e
+        elif self.__write_buffer_interval and collection not in self.__drain_handles:
+            self.__drain_handles[collection] = asyncio.get_running_loop().call_later(
+                self.__write_buffer_interval, self.__schedule_drain, collection
+            )
+
+    def __schedule_drain(self, collection: str):
+        self.__drain_handles.pop(collection, None)
+        task = asyncio.ensure_future(self.__background_drain(collection))
+        self.__drain_tasks.add(task)
+        task.add_done_callback(self.__drain_tasks.discard)
+
+    async def __background_drain(self, collection: str):
+        try:
+            await self.__drain(collection)
+        except Exception as e:
+            self.__write_errors[collection] = e
+
+    async def __drain(self, collection: str, seal: bool = False):
+        lock = self.__drain_locks.setdefault(collection, asyncio.Lock())
+        async with lock:
+            handle = self.__drain_handles.pop(collection, None)
+            if handle:
+                handle.cancel()
+            buffer = self.__write_buffers.pop(collection, [])
+            rows = self.__buffered_rows.pop(collection, 0)
+
+            if buffer:
+                columns = []
+                for parts in zip(*buffer):
+                    if isinstance(parts[0], np.ndarray):
+                        columns.append(np.concatenate(parts))
+                    else:
+                        columns.append([value for part in parts for value in part])
+                try:
+                    # Buffered rows were already accepted, never shed them
+                    await self.__executor.run("write", self.__insert, collection, columns, False, shed=False)
+                except Exception:
+                    # Put the rows back in front of those buffered meanwhile, the next drain retries them
+                    self.__write_buffers[collection] = buffer + self.__write_buffers.get(collection, [])
+                    self.__buffered_rows[collection] = rows + self.__buffered_rows.get(collection, 0)
+                    raise
+                finally:
+                    self.__invalidate(collection)
+                # Every buffered row is written, an earlier failed drain has nothing left to report
+                self.__write_errors.pop(collection, None)
+            if seal:
+                await self.__executor.run("write", self.__collections[collection].flush, shed=False)
+
+    async def __read_your_writes(self, collection: str, consistency_level: Optional[str]):
+        if self.__write_behind and consistency_level in ("Strong", "Session"):
+            await self.__drain(collection)
+
+    def __discard_buffer(self, collection: str):
+        handle = self.__drain_handles.pop(collection, None)
+        if handle:
+            handle.cancel()
+        self.__write_buffers.pop(collection, None)
+        self.__buffered_rows.pop(collection, None)
+        self.__write_errors.pop(collection, None)
+
+    def __raise_write_error(self, collection: str):
+        error = self.__write_errors.pop(collection, None)
+        if error:
+            raise error
+
+    def __insert(self, collection: str, columns: list, seal: bool = True):
+        partition_field = self.__collections_metadata[collection].get("partition_field")
+        if not partition_field:
+            self.__collections[collection].insert(columns)
+        else:
+            # Route each row to the partition of its partition field value
+            values = columns[self.__collections_metadata[collection]["schema_fields"].index(partition_field)]
+            rows = {}
+            for i, value in enumerate(values):
+                rows.setdefault(partition_name(value), []).append(i)
+            for name, indices in rows.items():
+                self.__create_partition(collection, name)
+                self.__collections[collection].insert(
+                    [column[indices] if isinstance(column, np.ndarray) else [column[i] for i in indices] for column in columns],
+                    partition_name=name
+                )
+        if seal:
+            self.__collections[collection].flush()
+
+    async def delete(self, collection: str, filter: Optional[Union[str, Expression]] = None, return_deleted: bool = True, batch_size: Optional[int] = None):
+        filters = self.__filters(collection, filter, batch=True)
+        if self.__write_behind:
+            await self.__drain(collection)
+
+        try:
+            # Milvus can not delete by an empty expression, deleting everything streams primary keys instead
+            if not return_deleted and not batch_size and all(filters):
+                count = 0
+                for filter in filters:
+                    count += await self.__executor.run("write", self.__delete, collection, filter)
+                return count
+
+            # Stream matching rows and delete them by primary key batch by batch, so a large purge stays bounded
+            output_fields = self.__collections_metadata[collection]["fields"] if return_deleted else ["dalmeng_pydb_data_id"]
+            result, count = [], 0
+            for filter in filters:
+                pinned = await self.__executor.run("read", self.__pinned_partitions, collection, filter)
+                # Rows inserted just before the delete must already be visible to the read that finds them
+                async for rows in self.__iter_batches(collection, filter, batch_size if batch_size else 1000, output_fields, "Strong"):
+                    ids = [row.pop("dalmeng_pydb_data_id") for row in rows]
+                    count += await self.__executor.run("write", self.__delete_primary_keys, collection, ids, pinned)
+                    if return_deleted:
+                        result.extend(rows)
+            
+            return result if return_deleted else count
+        finally:
+            # A failed delete may have removed some rows already
+            self.__invalidate(collection)
+
+    def __delete(self, collection: str, filter: Union[str, Expression]):
+        partition_names = self.__partitions(collection, filter)
+        if partition_names == []:
+            return 0
+        if partition_names is None:
+            return self.__collections[collection].delete(expr=milvus_expression(filter)).delete_count
+
+        self.__acquire_partitions(collection, partition_names)
+        try:
+            return sum(
+                self.__retry_unloaded(collection, [name], lambda: self.__collections[collection].delete(expr=milvus_expression(filter), partition_name=name)).delete_count
+                for name in partition_names
+            )
+        finally:
+            self.__release_partitions(collection, partition_names)
+
+    def __delete_primary_keys(self, collection: str, ids: List[str], partition_names: Optional[List[str]]):
+        # Deleting by primary key loads nothing, one call covers every partition unless the filter pinned some
+        if partition_names is None:
+            return self.__collections[collection].delete(expr=primary_key_filter(ids)).delete_count
+        return sum(
+            self.__collections[collection].delete(expr=primary_key_filter(ids), partition_name=name).delete_count
+            for name in partition_names
+        )
+
+async def iterate(source):
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+def primary_key_filter(ids: List[str]):
+    return "dalmeng_pydb_data_id in [{}]".format(", ".join("'{}'".format(i) for i in ids))
+
+def consistency(consistency_level: Optional[str]):
+    return {"consistency_level": consistency_level} if consistency_level else {}
+
+def materialize(hits, fields: List[str], output: str, with_score: bool = False):
+    # Hit.fields is the entity dict pymilvus already built, return it as is instead of going through to_dict()
+    if output == "tuple":
+        return [(hit.id, hit.distance, *(hit.fields.get(name) for name in fields)) for hit in hits]
+    if output == "array":
+        return {
+            "ids": [hit.id for hit in hits],
+            "scores": np.fromiter((hit.distance for hit in hits), dtype=np.float32, count=len(hits)),
+            "fields": {name: [hit.fields.get(name) for hit in hits] for name in fields}
+        }
+    if with_score:
+        return [(hit.fields, hit.distance) for hit in hits]
+    return [hit.fields for hit in hits]
+
+def partition(partition_names: Optional[List[str]]):
+    return {"partition_names": partition_names} if partition_names is not None else {}
+
+def partition_name(value: str):
+    # Partition names only allow letters, digits and underscores, the checksum keeps "a-b" and "a_b" apart
+    return "dalmeng_pydb_{}_{:08x}".format(re.sub(r"[^0-9A-Za-z_]", "_", value)[:128], zlib.crc32(value.encode("utf-8")))
+
+def milvus_expression(filter: Optional[Union[str, Expression]]):
+    return filter.to_milvus() if isinstance(filter, Expression) else filter
+
+def pinned_values(filter: Optional[Union[str, Expression]], field: str):
+    if not filter:
+        return None
+    if isinstance(filter, Expression):
+        values = filter.pinned(field)
+        return values if values is None or all(isinstance(value, str) for value in values) else None
+
+    # Raw strings: only a conjunction pins the field, any "or" / "not" may reach rows outside the pinned values
+    if re.search(r"\b(?:or|not)\b|\|\||!(?!=)", filter, flags=re.IGNORECASE):
+        return None
+
+    literals = [match.span() for match in re.finditer(STRING_LITERAL, filter)]
+    values = set()
+    for match in re.finditer(r"(?<![\w.]){}\s*(==|in\b)\s*".format(re.escape(field)), filter, flags=re.IGNORECASE):
+        if any(start <= match.start() < end for start, end in literals):
+            continue
+        if match.group(1) == "==":
+            literal = re.compile(STRING_LITERAL).match(filter, match.end())
+            if literal:
+                values.add(literal.group(0))
+            continue
+        # A list that does not parse as string literals up to its closing bracket can not be trusted
+        listing = re.compile(STRING_LIST).match(filter, match.end())
+        if not listing:
+            return None
+        values.update(literal.group(0) for literal in re.finditer(STRING_LITERAL, listing.group(0)))
+
+    try:
+        return sorted(unquote(value) for value in values) if values else None
+    except ValueError:
+        return None
 
-    def __delete(self, collection: str, filter: str):
-        self.__collections[collection].delete(expr=filter)
+def unquote(literal: str):
+    # Milvus decodes only these escapes, the value of a literal with any other one is not known here
+    def escape(match):
+        if match.group(1) not in ESCAPES:
+            raise ValueError("Unknown escape sequence.")
+        return ESCAPES[match.group(1)]
+    return re.sub(r"\\(.)", escape, literal[1:-1], flags=re.DOTALL)
 
 import random
 c = "1234567890qwertyuiopasdfghjklzxcvbnm"
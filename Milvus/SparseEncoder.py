@@ -0,0 +1,73 @@
+import re
+import math
+import zlib
+from collections import Counter
+from typing import Optional, List
+
+TOKEN = re.compile(r"\w+")
+# Milvus sparse vector indices are 32-bit and exclude the largest value
+SPARSE_DIMENSION = 2 ** 32 - 1
+# Milvus rejects empty sparse rows, an explicit zero keeps the row without adding to any score
+EMPTY = {0: 0.0}
+
+class SparseEncoder:
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, average_length: Optional[float] = None):
+        self.__k1 = float(k1)
+        self.__b = float(b)
+        self.__average_length = float(average_length) if average_length else None
+        self.__documents = 0
+        self.__total_length = 0
+        self.__document_frequency = Counter()
+
+    def fit(self, texts: List[str]):
+        for tokens in map(self.__tokens, texts):
+            self.__update(tokens)
+
+    def encode_documents(self, texts: List[str], update: bool = True):
+        # BM25 term saturation on the document side, IDF goes on the query side so that the inner product is the BM25 score
+        tokenized = [self.__tokens(text) for text in texts]
+        if update:
+            for tokens in tokenized:
+                self.__update(tokens)
+
+        k1, b = self.__k1, self.__b
+        average_length = self.__average()
+        vectors = []
+        for tokens in tokenized:
+            norm = k1 * (1 - b + b * len(tokens) / average_length)
+            vector = {dimension: tf * (k1 + 1) / (tf + norm) for dimension, tf in Counter(tokens).items()}
+            vectors.append(vector if vector else dict(EMPTY))
+        return vectors
+
+    def encode_queries(self, texts: List[str]):
+        documents = self.__documents
+        vectors = []
+        for text in texts:
+            vector = {
+                dimension: math.log(1 + (documents - self.__document_frequency[dimension] + 0.5) / (self.__document_frequency[dimension] + 0.5))
+                for dimension in set(self.__tokens(text))
+            }
+            vectors.append(vector if vector else dict(EMPTY))
+        return vectors
+
+    def stats(self):
+        return {
+            "documents": self.__documents,
+            "average_length": self.__average(),
+            "terms": len(self.__document_frequency)
+        }
+
+    def __update(self, tokens: List[int]):
+        self.__documents += 1
+        self.__total_length += len(tokens)
+        self.__document_frequency.update(set(tokens))
+
+    def __average(self):
+        if self.__average_length:
+            return self.__average_length
+        return self.__total_length / self.__documents if self.__total_length else 1.0
+
+    def __tokens(self, text: str):
+        # Hashing trick: no vocabulary to store, a token maps to the same index in every process
+        return [zlib.crc32(token.encode("utf-8")) % SPARSE_DIMENSION for token in TOKEN.findall(text.lower())]
@@ -1,10 +1,15 @@
 import asyncio
+import warnings
 import motor.motor_asyncio
+from pymongo import ReturnDocument
 from sqlalchemy.exc import DataError
-from typing import Optional, Union
+from typing import Optional, Union, List
+from Filter.Filter import Expression, UnindexedFieldWarning
+from Cache.ResultCache import ResultCache, freeze
+from Cache.SingleFlight import SingleFlight
 
 class MongoRepository:
-    def __init__(self, username: str, password: str, table: str, host: str = "127.0.0.1", port: int = 27017, authentication_database: str = "admin"):
+    def __init__(self, username: str, password: str, table: str, host: str = "127.0.0.1", port: int = 27017, authentication_database: str = "admin", result_cache: Optional[ResultCache] = None, single_flight: Optional[SingleFlight] = None):
         self.__client = motor.motor_asyncio.AsyncIOMotorClient("mongodb://{username}:{password}@{host}:{port}/?authSource={authSource}".format(
             username   = username,
             password   = password,
@@ -13,63 +18,96 @@ class MongoRepository:
             authSource = authentication_database
         ))
         self.__table = self.__client[table]
+        self.__indexed_fields = {}
+        self.__unindexed_warned = set()
+        self.__result_cache = result_cache
+        self.__single_flight = single_flight
+        self.__generations = {}
     
     async def clear_collections(self, collection_names: Optional[Union[str | list]] = None):
         if not collection_names:
             collection_names = await self.__table.list_collection_names()
             for collection_name in collection_names:
                 await self.__table[collection_name].delete_many({})
+                self.__invalidate(collection_name)
             return
         
         if isinstance(collection_names, str):
             collection_names = [collection_names]
         for collection_name in collection_names:
             await self.__table[collection_name].delete_many({})
+            self.__invalidate(collection_name)
     
-    async def find(self, collection: str, filter: dict = {}, find_one=False):
-        ret = []
-        async for o in self.__table[collection].find(filter):
-            if "_id" in o:
-                del o["_id"]
-                if "dalmeng_pydb_data_id" in o:
-                    del o["dalmeng_pydb_data_id"]
-                if find_one: return o
-                ret.append(o)
-        return None if find_one else ret
+    async def find(self, collection: str, filter: Union[dict, Expression] = {}, find_one=False, fields: Optional[List[str]] = None):
+        filter = await self.__filter(collection, filter)
+        key = (id(self), freeze(filter), find_one, freeze(fields))
+        if self.__result_cache is not None:
+            generation = self.__result_cache.generation(collection)
+            result = self.__result_cache.get(collection, key)
+            if result is not None:
+                return result
+
+        async def read():
+            # The server drops the internal ids (or keeps only `fields`), nothing is removed per document here
+            if find_one:
+                return await self.__table[collection].find_one(filter, projection(fields))
+            return [o async for o in self.__table[collection].find(filter, projection(fields))]
+
+        if self.__single_flight is not None:
+            # A find issued after a write of this repository never joins a find started before it
+            result = await self.__single_flight.run((collection, self.__generations.get(collection, 0), key), read)
+        else:
+            result = await read()
+
+        if self.__result_cache is not None:
+            self.__result_cache.put(collection, key, result, generation)
+        return result
 
-    async def upsert(self, collection: str, filter: dict, data: dict):
-        result = await self.__table[collection].find_one(filter)
-        if result:
-            data["dalmeng_pydb_data_id"] = result["dalmeng_pydb_data_id"]
+    async def upsert(self, collection: str, filter: Union[dict, Expression], data: dict, partial: bool = False):
+        if not isinstance(data, dict):
+            raise ValueError("To upsert data, data type must be dictionary.")
+        filter = await self.__filter(collection, filter)
+        # One atomic write instead of a read and a write, with a unique index on the filter fields concurrent upserts never insert twice
+        if partial:
+            result = await self.__table[collection].find_one_and_update(
+                filter,
+                {"$set": data, "$setOnInsert": {"dalmeng_pydb_data_id": random_id()}},
+                projection=projection(None),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            # A replacement carries a new internal id, it is never read back
             await self.__table[collection].replace_one(
-                filter={"dalmeng_pydb_data_id": result["dalmeng_pydb_data_id"]},
-                replacement=data
+                filter,
+                {**data, "dalmeng_pydb_data_id": random_id()},
+                upsert=True
             )
-            if "_id" in data:
-                del data["_id"]
-            if "dalmeng_pydb_data_id" in data:
-                del data["dalmeng_pydb_data_id"]
-            return data
-        return await self.insert(
-            collection=collection,
-            data=data,
-            insert_one=True
-        )
+            result = data
+        self.__invalidate(collection)
+        return result
     
-    async def update(self, collection: str, filter: dict, data: dict):
-        result = await self.__table[collection].find_one(filter)
-        if not result: raise DataError
-        data["dalmeng_pydb_data_id"] = result["dalmeng_pydb_data_id"]
-        await self.__table[collection].replace_one(
-            filter={"dalmeng_pydb_data_id": result["dalmeng_pydb_data_id"]},
-            replacement=data
-        )
-        if "_id" in data:
-            del data["_id"]
-        if "dalmeng_pydb_data_id" in data:
-            del data["dalmeng_pydb_data_id"]
-        return data
-        
+    async def update(self, collection: str, filter: Union[dict, Expression], data: dict, partial: bool = False):
+        if not isinstance(data, dict):
+            raise ValueError("To update data, data type must be dictionary.")
+        filter = await self.__filter(collection, filter)
+        if partial:
+            result = await self.__table[collection].find_one_and_update(
+                filter,
+                {"$set": data},
+                projection=projection(None),
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            replaced = await self.__table[collection].find_one_and_replace(
+                filter,
+                {**data, "dalmeng_pydb_data_id": random_id()},
+                projection={"_id": 1}
+            )
+            result = data if replaced is not None else None
+        if result is None: raise DataError
+        self.__invalidate(collection)
+        return result
 
     async def insert(self, collection: str, data: dict | list[dict], insert_one=True):
         if insert_one:
@@ -85,6 +123,7 @@ class MongoRepository:
                 d["dalmeng_pydb_data_id"] = random_id()
             await self.__table[collection].insert_many(data)
             inserted_data = data
+        self.__invalidate(collection)
 
         if inserted_data and isinstance(inserted_data, dict):
             if "_id" in inserted_data:
@@ -99,10 +138,55 @@ class MongoRepository:
                     del d["dalmeng_pydb_data_id"]
         return inserted_data
 
-    async def delete(self, collection: str, filter: dict = {}):
-        data = await self.find(collection, filter)
-        await self.__table[collection].delete_many(filter)
-        return data
+    async def delete(self, collection: str, filter: Union[dict, Expression] = {}, return_deleted: bool = True, batch_size: int = 1000):
+        filter = await self.__filter(collection, filter)
+        try:
+            if not return_deleted:
+                result = await self.__table[collection].delete_many(filter)
+                return result.deleted_count
+
+            # Stream matching documents and delete them by _id batch by batch, so a large purge stays bounded
+            ret, ids = [], []
+            async for o in self.__table[collection].find(filter, {"dalmeng_pydb_data_id": 0}).batch_size(batch_size):
+                ids.append(o.pop("_id"))
+                ret.append(o)
+                if len(ids) >= batch_size:
+                    await self.__table[collection].delete_many({"_id": {"$in": ids}})
+                    ids = []
+            if ids:
+                await self.__table[collection].delete_many({"_id": {"$in": ids}})
+            return ret
+        finally:
+            # A failed delete may have removed some documents already
+            self.__invalidate(collection)
+
+    def __invalidate(self, collection: str):
+        self.__generations[collection] = self.__generations.get(collection, 0) + 1
+        if self.__result_cache is not None:
+            self.__result_cache.invalidate(collection)
+
+    async def __filter(self, collection: str, filter: Optional[Union[dict, Expression]]):
+        if filter is None:
+            return {}
+        if not isinstance(filter, Expression):
+            return filter
+
+        if collection not in self.__indexed_fields:
+            # Only the leading key of an index serves a query on its own
+            indexes = await self.__table[collection].index_information()
+            self.__indexed_fields[collection] = {index["key"][0][0] for index in indexes.values()}
+        for field in filter.fields():
+            if field not in self.__indexed_fields[collection] and (collection, field) not in self.__unindexed_warned:
+                self.__unindexed_warned.add((collection, field))
+                warnings.warn("Filter on unindexed field '{}' of collection '{}' scans every document.".format(field, collection), UnindexedFieldWarning, stacklevel=3)
+        return filter.to_mongo()
+
+def projection(fields: Optional[List[str]]):
+    if fields is None:
+        return {"_id": 0, "dalmeng_pydb_data_id": 0}
+    if not isinstance(fields, list) or not fields or not all(isinstance(f, str) and f not in ("_id", "dalmeng_pydb_data_id") for f in fields):
+        raise ValueError("To project fields, fields type must be non-empty list containing field names.")
+    return {"_id": 0, **{field: 1 for field in fields}}
 
 import random
 c = "1234567890qwertyuiopasdfghjklzxcvbnm"
@@ -0,0 +1,183 @@
+import sys
+import os
+import json
+import time
+import argparse
+import asyncio
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Milvus.MilvusRepository import MilvusRepository
+from Milvus.MilvusField import *
+from Milvus.MilvusIndex import *
+from Milvus.Embedder import Embedder, HashingEmbeddingBackend
+from Milvus.EmbeddingServer import start_embedding_server
+
+"""
+    Recall / Latency Benchmark for Milvus Index Configurations
+
+    python Test/benchmark_milvus_repository.py --rows 20000 --dimension 128 \\
+        --index FLAT --index HNSW:ef=16,64,256 --index IVF_FLAT:nprobe=8,32,128 --output result.json
+
+    * Runs against milvus-lite (`--uri`, temporary file by default) with the bundled stand-in embedding server
+      (`--latency-ms` adds artificial latency). Documents and queries are random word sequences, and recall@k is
+      measured against exact brute-force NumPy results over the same hashing embeddings.
+    * `--index TYPE[:param=v1,v2,...]` sweeps one search param of one index type.
+"""
+
+COLLECTION = "benchmark_collection"
+
+def parse_sweep(spec: str):
+    index_type, _, sweep = spec.partition(":")
+    if not sweep:
+        return index_type, [{}]
+    name, _, values = sweep.partition("=")
+    return index_type, [{name: int(value)} for value in values.split(",")]
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, metric_type: str):
+    if metric_type == "COSINE":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if metric_type == "L2":
+        scores = -((queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1))
+    else:
+        scores = queries @ corpus.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+def percentile(latencies: list, q: float):
+    return float(np.percentile(latencies, q)) if latencies else None
+
+def synthetic_texts(rng: np.random.Generator, count: int, vocabulary: int, words: int):
+    # Zipf-like word frequencies so documents share common words and differ in rare ones
+    weights = 1 / np.arange(1, vocabulary + 1)
+    tokens = rng.choice(vocabulary, size=(count, words), p=weights / weights.sum())
+    return [" ".join("w{}".format(token) for token in row) for row in tokens]
+
+def embed_all(backend: HashingEmbeddingBackend, texts: list, batch_size: int):
+    return np.concatenate([backend.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+async def run_queries(repository: MilvusRepository, queries: list, k: int, search_params: dict, concurrency: int, consistency_level: str):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = [0.0] * len(queries)
+
+    async def query(j: int):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await repository.retrieval(
+                collection=COLLECTION,
+                text=queries[j],
+                limit=k,
+                consistency_level=consistency_level,
+                search_params=search_params
+            )
+            latencies[j] = (time.perf_counter() - started) * 1000
+            return [int(entity["doc_id"]) for entity in result]
+
+    started = time.perf_counter()
+    retrieved = await asyncio.gather(*[query(j) for j in range(len(queries))])
+    return retrieved, latencies, time.perf_counter() - started
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="COSINE")
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--index", action="append", default=None)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--consistency-level", default="Session")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uri", default=os.path.join(tempfile.mkdtemp(), "benchmark.db"))
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    sweeps = [parse_sweep(spec) for spec in (args.index if args.index else ["FLAT", "HNSW:ef=16,64,256"])]
+
+    rng = np.random.default_rng(args.seed)
+    documents = synthetic_texts(rng, args.rows, args.vocabulary, args.words)
+    queries = synthetic_texts(rng, args.queries, args.vocabulary, args.words)
+    backend = HashingEmbeddingBackend(dimension=args.dimension, seed=args.seed)
+    ground_truth = exact_top_k(
+        embed_all(backend, documents, args.batch_size),
+        embed_all(backend, queries, args.batch_size),
+        args.k,
+        args.metric
+    )
+
+    runner, port = await start_embedding_server(port=0, backend=backend, latency_ms=args.latency_ms)
+    repository = MilvusRepository(
+        embedding_dimension=args.dimension,
+        metric_type=args.metric,
+        index_type="FLAT",
+        milvus_uri=args.uri,
+        expected_rows=args.rows,
+        embedder=Embedder(embedding_ip="127.0.0.1", embedding_port=port)
+    )
+
+    results = []
+    for index_type, search_params_list in sweeps:
+        await repository.clear_collections(COLLECTION)
+        try:
+            await repository.add_collection_async(
+                collection_name=COLLECTION,
+                collection_fields=[
+                    StringField("doc_id", 16),
+                    VectorField("embedding")
+                ],
+                indexes=[],
+                vector_index=VectorIndex(index_type, expected_rows=args.rows)
+            )
+            ingested = await repository.ingest(
+                collection=COLLECTION,
+                source=((document, {"doc_id": str(i)}) for i, document in enumerate(documents)),
+                batch_size=args.batch_size
+            )
+        except Exception as e:
+            results.append({"index_type": index_type, "error": str(e)})
+            continue
+
+        for search_params in search_params_list:
+            retrieved, latencies, seconds = await run_queries(
+                repository, queries, args.k, search_params, args.concurrency, args.consistency_level
+            )
+            recall = [len(set(ids) & set(truth.tolist())) / args.k for ids, truth in zip(retrieved, ground_truth)]
+            results.append({
+                "index_type": index_type,
+                "search_params": search_params,
+                "ingest_rows_per_second": ingested["rows_per_second"],
+                "recall_at_k": float(np.mean(recall)),
+                "latency_ms": {
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "mean": float(np.mean(latencies))
+                },
+                "qps": args.queries / seconds
+            })
+
+    await repository.clear_collections(COLLECTION)
+    await repository.aclose()
+    await runner.cleanup()
+
+    report = json.dumps({
+        "rows": args.rows,
+        "dimension": args.dimension,
+        "queries": args.queries,
+        "k": args.k,
+        "metric_type": args.metric,
+        "concurrency": args.concurrency,
+        "embedding_latency_ms": args.latency_ms,
+        "results": results
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+
+asyncio.run(main())
@@ -0,0 +1,288 @@
+import sys
+import os
+import functools
+import asyncio
+import inspect
+import tempfile
+import numpy as np
+from colorama import Fore, init
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Milvus.Embedder import Embedder, HashingEmbeddingBackend
+from Milvus.EmbeddingServer import start_embedding_server
+from Milvus.EmbeddingCache import EmbeddingCache, DiskEmbeddingCache, TieredEmbeddingCache
+
+# colorama 초기화
+init(autoreset=True)
+test_result = []
+
+def Test(description):
+    global test_result
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Before test execution
+            print(Fore.YELLOW + "=" * 50)
+            print(Fore.YELLOW + "[Test Information]")
+            print(Fore.YELLOW + "Test Start: " + description)
+            print(Fore.YELLOW + "Function Name: " + func.__name__ + "\n")
+
+            # Execute the test function
+            result = await func(*args, **kwargs)
+
+            # After test execution
+            print(Fore.YELLOW + "[Test Results]")
+            print(Fore.YELLOW + "Expected Result:", result["expected"])
+            print(Fore.YELLOW + "Actual Result  :", result["actual"])
+            r = result["expected"] == result["actual"]
+
+            test_result.append({
+                "test_name": description,
+                "test_result": r
+            })
+
+            print(Fore.YELLOW + "Final Result   : " + (Fore.GREEN + "Succeed" if r else Fore.RED + "Failed"))
+            print(Fore.YELLOW + "=" * 50)
+
+            return result
+
+        return wrapper
+    return decorator
+
+class EmbedderTest:
+    embedder = Embedder(
+        embedding_ip="127.0.0.1",
+        embedding_port=7777
+    )
+    coalescing_embedder = Embedder(
+        embedding_ip="127.0.0.1",
+        embedding_port=7777,
+        coalesce=True,
+        max_batch_size=4,
+        max_wait_ms=5
+    )
+    caching_embedder = Embedder(
+        embedding_ip="127.0.0.1",
+        embedding_port=7777,
+        cache=EmbeddingCache(max_bytes=1024 * 1024),
+        model="test",
+        embedding_dimension=768
+    )
+
+    async def do_test(self):
+        global test_result
+
+        tests = [
+            self.test_1(),
+            self.test_2(),
+            self.test_3(),
+            self.test_4(),
+            self.test_5(),
+            self.test_6(),
+            self.test_7(),
+            self.test_8(),
+            self.test_9(),
+            self.test_10(),
+            self.test_11(),
+            self.test_12(),
+            self.test_13(),
+            self.test_14(),
+        ]
+        for test in tests:
+            await test
+        
+        print(Fore.YELLOW + "=" * 50)
+        print(Fore.YELLOW + "[Test Summary]")
+        cnt, s = 1, 0
+        for test in test_result:
+            print(Fore.YELLOW + f"[Test {cnt}] " + test["test_name"] + " -> " + (Fore.GREEN + "Succeed" if test["test_result"] else Fore.RED + "Failed"))
+            cnt += 1
+            if test["test_result"]:
+                s += 1
+        cnt -= 1
+        print(Fore.YELLOW + "=" * 50)
+        print(Fore.BLUE + f"{s} Tests Succeed over Total {cnt} Tests.\n")
+        
+    @Test("Test #1. Encode Single Text")
+    async def test_1(self):
+        result = await self.embedder.encode("This is test data")
+        return {
+            "expected": "Length : 768",
+            "actual": "Length : {}".format(len(result))
+        }
+    
+    @Test("Test #2. Encode Multiple Texts")
+    async def test_2(self):
+        result = await self.embedder.encode(["AWS", "Solutions", "Architect"])
+        return {
+            "expected": [await self.embedder.encode(text) for text in ["AWS", "Solutions", "Architect"]],
+            "actual": result
+        }
+    
+    @Test("Test #3. Encode Concurrent Single Texts with Coalescing")
+    async def test_3(self):
+        texts = ["text {}".format(i) for i in range(10)]
+        result = await asyncio.gather(*[self.coalescing_embedder.encode(text) for text in texts])
+        return {
+            "expected": await self.embedder.encode(texts),
+            "actual": list(result)
+        }
+
+    @Test("Test #4. Encode Multiple Texts with Cache")
+    async def test_4(self):
+        await self.caching_embedder.encode("AWS")
+        result = await self.caching_embedder.encode(["AWS", "DevOps", "AWS"])
+        stats = self.caching_embedder.cache.stats()
+        return {
+            "expected": ([await self.embedder.encode(text) for text in ["AWS", "DevOps", "AWS"]], 2, 2),
+            "actual": (result, stats["entries"], stats["hits"])
+        }
+
+    @Test("Test #5. Share Disk Cache between Writer and Reader")
+    async def test_5(self):
+        path = os.path.join(tempfile.mkdtemp(), "embedding_cache")
+        writer = Embedder(
+            embedding_ip="127.0.0.1",
+            embedding_port=7777,
+            cache=TieredEmbeddingCache(EmbeddingCache(), DiskEmbeddingCache(path, dimension=768)),
+            embedding_dimension=768
+        )
+        reader_cache = DiskEmbeddingCache(path, dimension=768, read_only=True)
+        reader = Embedder(
+            embedding_ip="127.0.0.1",
+            embedding_port=0,
+            cache=reader_cache,
+            embedding_dimension=768
+        )
+
+        expected = await writer.encode(["AWS", "DevOps"])
+        result = await reader.encode(["AWS", "DevOps"])
+        return {
+            "expected": (True, 2),
+            "actual": (bool(np.allclose(expected, result)), reader_cache.stats()["hits"])
+        }
+
+    @Test("Test #6. Encode Multiple Texts in Chunks")
+    async def test_6(self):
+        chunking_embedder = Embedder(
+            embedding_ip="127.0.0.1",
+            embedding_port=7777,
+            chunk_size=3,
+            max_concurrent_chunks=2
+        )
+        texts = ["text {}".format(i) for i in range(10)]
+        reported = []
+        result = await chunking_embedder.encode(texts, progress=lambda completed, total: reported.append((completed, total)))
+        return {
+            "expected": (await self.embedder.encode(texts), 4, (10, 10)),
+            "actual": (result, len(reported), reported[-1])
+        }
+
+    @Test("Test #7. Encode with Owned Connection Pool")
+    async def test_7(self):
+        async with Embedder(embedding_ip="127.0.0.1", embedding_port=7777, connection_limit=2, timeout=10) as pooled_embedder:
+            await asyncio.gather(*[pooled_embedder.encode("text {}".format(i)) for i in range(4)])
+            stats = pooled_embedder.pool_stats()
+        return {
+            "expected": (4, 0),
+            "actual": (stats["requests"], stats["in_flight"])
+        }
+
+    @Test("Test #8. Encode Multiple Texts with Binary Response")
+    async def test_8(self):
+        binary_embedder = Embedder(
+            embedding_ip="127.0.0.1",
+            embedding_port=7777,
+            response_format="float32"
+        )
+        texts = ["AWS", "Solutions", "Architect"]
+        result = await binary_embedder.encode(texts)
+        return {
+            "expected": (True, (3, 768), True),
+            "actual": (isinstance(result, np.ndarray), result.shape, bool(np.allclose(result, await self.embedder.encode(texts))))
+        }
+
+    @Test("Test #9. Encode with In-Process Hashing Backend")
+    async def test_9(self):
+        hashing_embedder = Embedder(backend=HashingEmbeddingBackend(dimension=768, seed=1))
+        result = await hashing_embedder.encode(["I like soccer.", "I like soccer.", "I love pizza."])
+        return {
+            "expected": ((3, 768), True, False),
+            "actual": (result.shape, bool(np.array_equal(result[0], result[1])), bool(np.array_equal(result[0], result[2])))
+        }
+    
+    @Test("Test #10. Encode through Stand-In Embedding Server")
+    async def test_10(self):
+        backend = HashingEmbeddingBackend(dimension=768, seed=1)
+        runner, port = await start_embedding_server(port=0, backend=backend, latency_ms=5)
+        async with Embedder(embedding_ip="127.0.0.1", embedding_port=port, response_format="float32") as server_embedder:
+            result = await server_embedder.encode(["AWS", "DevOps"])
+        await runner.cleanup()
+        return {
+            "expected": True,
+            "actual": bool(np.allclose(result, backend.embed(["AWS", "DevOps"])))
+        }
+
+    @Test("Test #11. Reopen Disk Cache while a Returned Vector is Alive")
+    async def test_11(self):
+        path = os.path.join(tempfile.mkdtemp(), "embedding_cache")
+        cache = DiskEmbeddingCache(path, dimension=4)
+        cache.put("AWS", np.ones(4))
+        vector = cache.get("AWS")
+        cache.close()
+        reopened = DiskEmbeddingCache(path, dimension=4)
+        result = reopened.get("AWS")
+        reopened.close()
+        return {
+            "expected": (True, True),
+            "actual": (bool(np.array_equal(vector, np.ones(4))), bool(np.array_equal(result, np.ones(4))))
+        }
+
+    @Test("Test #12. Encode Empty Text List")
+    async def test_12(self):
+        hashing_embedder = Embedder(backend=HashingEmbeddingBackend(dimension=768))
+        return {
+            "expected": ([], []),
+            "actual": (await self.embedder.encode([]), await hashing_embedder.encode([]))
+        }
+
+    @Test("Test #13. Cache Rows of Binary Response without the Response Buffer")
+    async def test_13(self):
+        cache = EmbeddingCache(max_bytes=1024 * 1024)
+        binary_embedder = Embedder(
+            embedding_ip="127.0.0.1",
+            embedding_port=7777,
+            response_format="float32",
+            cache=cache
+        )
+        result = await binary_embedder.encode(["AWS", "DevOps"])
+        cached = await binary_embedder.encode("AWS")
+        return {
+            "expected": (True, True),
+            "actual": (cached.base is None, bool(np.allclose(cached, result[0])))
+        }
+
+    @Test("Test #14. Encode with Timeout against Slow Embedding Server")
+    async def test_14(self):
+        runner, port = await start_embedding_server(port=0, backend=HashingEmbeddingBackend(dimension=768), latency_ms=500)
+        result = []
+        async with Embedder(embedding_ip="127.0.0.1", embedding_port=port) as direct_embedder, \
+                Embedder(embedding_ip="127.0.0.1", embedding_port=port, coalesce=True) as coalescing_embedder:
+            for slow_embedder in [direct_embedder, coalescing_embedder]:
+                try:
+                    await slow_embedder.encode("AWS", timeout=0.05)
+                    result.append(None)
+                except Exception as e:
+                    result.append(type(e).__name__)
+        await runner.cleanup()
+        return {
+            "expected": ["TimeoutError", "TimeoutError"],
+            "actual": result
+        }
+
+async def main():
+    t = EmbedderTest()
+    await t.do_test()
+
+asyncio.run(main())
@@ -3,13 +3,19 @@ import os
 import functools
 import asyncio
 import inspect
+import threading
 from colorama import Fore, init
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from pymilvus import Collection
 from Milvus.MilvusRepository import MilvusRepository
+from Milvus.MilvusExecutor import MilvusExecutor, ExecutorOverloadedError
 from Milvus.MilvusField import *
 from Milvus.MilvusIndex import *
+from Filter.Filter import *
+from Cache.ResultCache import ResultCache
+from Cache.SingleFlight import SingleFlight
 
 # colorama 초기화
 init(autoreset=True)
@@ -85,6 +91,26 @@ class MilvusTest:
             self.test_8(),
             self.test_9(),
             self.test_10(),
+            self.test_11(),
+            self.test_12(),
+            self.test_13(),
+            self.test_14(),
+            self.test_15(),
+            self.test_16(),
+            self.test_17(),
+            self.test_18(),
+            self.test_19(),
+            self.test_20(),
+            self.test_21(),
+            self.test_22(),
+            self.test_23(),
+            self.test_24(),
+            self.test_25(),
+            self.test_26(),
+            self.test_27(),
+            self.test_28(),
+            self.test_29(),
+            self.test_30(),
         ]
         for test in tests:
             await test
@@ -310,6 +336,531 @@ class MilvusTest:
             "actual": "Length : {}".format(len(result))
         }
     
+    @Test("Test #11. Retrieval Multiple Queries")
+    async def test_11(self):
+        result = await self.milvus_repository.retrieval_many(
+            collection="test_collection",
+            texts=["AWS", "DevOps", "This is test retrieval sentence."],
+            filter="group_id == 'dalmengs'",
+            limit=2
+        )
+        print(result, end="\n\n")
+        return {
+            "expected": "Length : [2, 2, 2]",
+            "actual": "Length : {}".format([len(r) for r in result])
+        }
+    
+    @Test("Test #12. Insert Data with Write-Behind Buffer")
+    async def test_12(self):
+        repository = MilvusRepository(
+            embedding_dimension=768,
+            write_behind=True,
+            write_buffer_rows=3,
+            write_buffer_interval_ms=None
+        )
+        await repository.clear_collections("test_write_behind_collection")
+        await repository.add_collection_async(
+            collection_name="test_write_behind_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[]
+        )
+
+        await repository.insert(
+            collection="test_write_behind_collection",
+            text="This is buffered data",
+            data={"user_id": "dalmeng"}
+        )
+        buffered = await repository.find(collection="test_write_behind_collection")
+        result = await repository.find(
+            collection="test_write_behind_collection",
+            consistency_level="Strong"
+        )
+        await repository.clear_collections("test_write_behind_collection")
+        return {
+            "expected": ([], [{"user_id": "dalmeng"}]),
+            "actual": (buffered, result)
+        }
+    
+    @Test("Test #13. Ingest Data from Async Iterator")
+    async def test_13(self):
+        async def source():
+            for i in range(5):
+                yield "Ingest sentence {}".format(i), {"user_id": "ingest", "group_id": str(i)}
+
+        result = await self.milvus_repository.ingest(
+            collection="test_collection",
+            source=source(),
+            batch_size=2
+        )
+        found = await self.milvus_repository.find(
+            collection="test_collection",
+            filter="user_id == 'ingest'"
+        )
+        return {
+            "expected": (5, 5),
+            "actual": (result["rows"], len(found))
+        }
+    
+    @Test("Test #14. Find Data with Limit and Offset")
+    async def test_14(self):
+        result = await self.milvus_repository.find(
+            collection="test_collection",
+            filter="user_id == 'ingest'",
+            limit=2,
+            offset=2
+        )
+        return {
+            "expected": "Length : 2",
+            "actual": "Length : {}".format(len(result))
+        }
+    
+    @Test("Test #15. Iterate Data in Batches")
+    async def test_15(self):
+        result = []
+        async for data in self.milvus_repository.iter_find(
+            collection="test_collection",
+            filter="user_id == 'ingest'",
+            batch_size=2
+        ):
+            result.append(data)
+        return {
+            "expected": sorted(str(i) for i in range(5)),
+            "actual": sorted(data["group_id"] for data in result)
+        }
+    
+    @Test("Test #16. Delete Data without Returning Deleted Data")
+    async def test_16(self):
+        result = await self.milvus_repository.delete(
+            collection="test_collection",
+            filter="user_id == 'ingest'",
+            return_deleted=False,
+            batch_size=2
+        )
+        return {
+            "expected": 5,
+            "actual": result
+        }
+    
+    @Test("Test #17. Route Data to Partitions by Partition Field")
+    async def test_17(self):
+        await self.milvus_repository.clear_collections("test_partition_collection")
+        await self.milvus_repository.add_collection_async(
+            collection_name="test_partition_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[],
+            partition_field="user_id",
+            partitions=["dalmeng"],
+            max_loaded_partitions=1
+        )
+
+        await self.milvus_repository.insert(
+            collection="test_partition_collection",
+            text=["Partition data of dalmeng", "Partition data of guest"],
+            data=[{"user_id": "dalmeng"}, {"user_id": "guest"}],
+            insert_one=False
+        )
+        guest = await self.milvus_repository.find(
+            collection="test_partition_collection",
+            filter="user_id == 'guest'",
+            consistency_level="Strong"
+        )
+        dalmeng = await self.milvus_repository.retrieval(
+            collection="test_partition_collection",
+            text="Partition data",
+            filter="user_id == 'dalmeng'",
+            consistency_level="Strong"
+        )
+        nobody = await self.milvus_repository.find(
+            collection="test_partition_collection",
+            filter="user_id == 'nobody'"
+        )
+        await self.milvus_repository.clear_collections("test_partition_collection")
+        return {
+            "expected": ([{"user_id": "guest"}], [{"user_id": "dalmeng"}], []),
+            "actual": (guest, dalmeng, nobody)
+        }
+    
+    @Test("Test #18. Find Data using Filter Expression")
+    async def test_18(self):
+        result = await self.milvus_repository.find(
+            collection="test_collection",
+            filter=(Field("group_id") == "dalmengs") & Field("user_id").isin(["testdalmeng", "nobody"])
+        )
+        return {
+            "expected": [{"user_id": "testdalmeng", "group_id": "dalmengs"}],
+            "actual": result
+        }
+    
+    @Test("Test #19. Retrieval Data as Tuples with Field Projection")
+    async def test_19(self):
+        result = await self.milvus_repository.retrieval(
+            collection="test_collection",
+            text="This is test retrieval sentence.",
+            filter="group_id == 'dalmengs'",
+            limit=2,
+            fields=["user_id"],
+            output="tuple"
+        )
+        print(result, end="\n\n")
+        return {
+            "expected": ["testdalmeng", "testdalmenguser"],
+            "actual": sorted(user_id for _, _, user_id in result)
+        }
+    
+    @Test("Test #20. Retrieval Data with Scores above Minimum Score")
+    async def test_20(self):
+        result = await self.milvus_repository.retrieval(
+            collection="test_collection",
+            text="AWS",
+            limit=3,
+            with_score=True,
+            min_score=0.99
+        )
+        print(result, end="\n\n")
+        return {
+            "expected": [({"user_id": "testdata", "group_id": "dalmeng"}, 1.0)],
+            "actual": [(entity, round(score, 2)) for entity, score in result]
+        }
+    
+    @Test("Test #21. Hybrid Retrieval with Dense and Sparse Vectors")
+    async def test_21(self):
+        await self.milvus_repository.clear_collections("test_hybrid_collection")
+        await self.milvus_repository.add_collection_async(
+            collection_name="test_hybrid_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding"),
+                SparseVectorField("keywords")
+            ],
+            indexes=[]
+        )
+        await self.milvus_repository.insert(
+            collection="test_hybrid_collection",
+            text=["I like kubernetes clusters", "I love pizza", "Soccer is fun"],
+            data=[{"user_id": "kubernetes"}, {"user_id": "pizza"}, {"user_id": "soccer"}],
+            insert_one=False
+        )
+        result = await self.milvus_repository.hybrid_retrieval(
+            collection="test_hybrid_collection",
+            text="kubernetes",
+            limit=3,
+            consistency_level="Strong"
+        )
+        await self.milvus_repository.clear_collections("test_hybrid_collection")
+        return {
+            "expected": {"user_id": "kubernetes"},
+            "actual": result[0] if result else None
+        }
+    
+    @Test("Test #22. Retrieval on Several Vector Fields")
+    async def test_22(self):
+        await self.milvus_repository.clear_collections("test_multi_vector_collection")
+        await self.milvus_repository.add_collection_async(
+            collection_name="test_multi_vector_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("title"),
+                VectorField("body", metric_type="IP")
+            ],
+            indexes=[]
+        )
+        await self.milvus_repository.insert(
+            collection="test_multi_vector_collection",
+            text=[{"title": "I love pizza", "body": "Soccer is fun"}, {"title": "Soccer is fun", "body": "I love pizza"}],
+            data=[{"user_id": "pizza_title"}, {"user_id": "pizza_body"}],
+            insert_one=False
+        )
+        title = await self.milvus_repository.retrieval(
+            collection="test_multi_vector_collection",
+            text="I love pizza",
+            limit=1,
+            consistency_level="Strong",
+            vector_field="title"
+        )
+        body = await self.milvus_repository.retrieval(
+            collection="test_multi_vector_collection",
+            text="I love pizza",
+            limit=1,
+            consistency_level="Strong",
+            vector_field="body"
+        )
+        both = await self.milvus_repository.retrieval(
+            collection="test_multi_vector_collection",
+            text="I love pizza",
+            limit=2,
+            consistency_level="Strong",
+            vector_field=["title", "body"]
+        )
+        await self.milvus_repository.clear_collections("test_multi_vector_collection")
+        return {
+            "expected": [[{"user_id": "pizza_title"}], [{"user_id": "pizza_body"}], ["pizza_body", "pizza_title"]],
+            "actual": [title, body, sorted(entity["user_id"] for entity in both)]
+        }
+    
+    @Test("Test #23. Result Cache Invalidated by Insert")
+    async def test_23(self):
+        result_cache = ResultCache(max_entries=16, ttl_seconds=60)
+        milvus_repository = MilvusRepository(
+            embedding_dimension=768,
+            result_cache=result_cache
+        )
+        await milvus_repository.clear_collections("test_cache_collection")
+        await milvus_repository.add_collection_async(
+            collection_name="test_cache_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[]
+        )
+        await milvus_repository.insert(collection="test_cache_collection", text="I love pizza", data={"user_id": "pizza"})
+        first = await milvus_repository.find(collection="test_cache_collection", consistency_level="Session")
+        first.append({"user_id": "mutated"})
+        second = await milvus_repository.find(collection="test_cache_collection", consistency_level="Session")
+        await milvus_repository.insert(collection="test_cache_collection", text="Soccer is fun", data={"user_id": "soccer"})
+        third = await milvus_repository.find(collection="test_cache_collection", consistency_level="Session")
+        await milvus_repository.clear_collections("test_cache_collection")
+        await milvus_repository.aclose()
+        stats = result_cache.stats()
+        return {
+            "expected": [[{"user_id": "pizza"}], ["pizza", "soccer"], 1, 2],
+            "actual": [second, sorted(row["user_id"] for row in third), stats["hits"], stats["misses"]]
+        }
+    
+    @Test("Test #24. Identical Concurrent Retrievals Share One Call")
+    async def test_24(self):
+        single_flight = SingleFlight()
+        milvus_repository = MilvusRepository(
+            embedding_dimension=768,
+            single_flight=single_flight
+        )
+        await milvus_repository.clear_collections("test_single_flight_collection")
+        await milvus_repository.add_collection_async(
+            collection_name="test_single_flight_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[]
+        )
+        await milvus_repository.insert(collection="test_single_flight_collection", text="I love pizza", data={"user_id": "pizza"})
+        results = await asyncio.gather(*[
+            milvus_repository.retrieval(collection="test_single_flight_collection", text="pizza", consistency_level="Session")
+            for _ in range(8)
+        ])
+        results[0][0]["user_id"] = "mutated"
+        await milvus_repository.clear_collections("test_single_flight_collection")
+        await milvus_repository.aclose()
+        return {
+            "expected": [[[{"user_id": "pizza"}]] * 7, {"calls": 1, "shared": 7}],
+            "actual": [results[1:], {"calls": single_flight.calls, "shared": single_flight.shared}]
+        }
+    
+    @Test("Test #25. Keep Buffered Data after a Failed Write-Behind Insert")
+    async def test_25(self):
+        repository = MilvusRepository(
+            embedding_dimension=768,
+            write_behind=True,
+            write_buffer_rows=3,
+            write_buffer_interval_ms=None
+        )
+        await repository.clear_collections("test_write_behind_retry_collection")
+        await repository.add_collection_async(
+            collection_name="test_write_behind_retry_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[]
+        )
+
+        # The first insert fails once, as a transient server error would
+        insert = Collection.insert
+        failures = [ConnectionError("Transient insert failure")]
+        def failing_insert(collection, *args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return insert(collection, *args, **kwargs)
+        Collection.insert = failing_insert
+        try:
+            for user_id in ["a", "b", "c"]:
+                await repository.insert(
+                    collection="test_write_behind_retry_collection",
+                    text="This is buffered data " + user_id,
+                    data={"user_id": user_id}
+                )
+            await repository.flush("test_write_behind_retry_collection")
+        finally:
+            Collection.insert = insert
+
+        result = await repository.find(
+            collection="test_write_behind_retry_collection",
+            consistency_level="Strong"
+        )
+        await repository.clear_collections("test_write_behind_retry_collection")
+        await repository.aclose()
+        return {
+            "expected": ["a", "b", "c"],
+            "actual": sorted(row["user_id"] for row in result)
+        }
+    
+    @Test("Test #26. Find Data with Tab and Quote in Filter Value")
+    async def test_26(self):
+        await self.milvus_repository.insert(
+            collection="test_collection",
+            text="This value has a tab",
+            data={"user_id": "tab\there \"quoted\" \\", "group_id": "escapes"}
+        )
+        result = await self.milvus_repository.find(
+            collection="test_collection",
+            filter=Field("user_id") == "tab\there \"quoted\" \\"
+        )
+        await self.milvus_repository.delete(
+            collection="test_collection",
+            filter=Field("group_id") == "escapes"
+        )
+        return {
+            "expected": [{"user_id": "tab\there \"quoted\" \\", "group_id": "escapes"}],
+            "actual": result
+        }
+    
+    @Test("Test #27. Find Data using Repeated and Empty Filter Lists")
+    async def test_27(self):
+        repository = MilvusRepository(
+            embedding_dimension=768,
+            in_list_batch_size=2
+        )
+        await repository.clear_collections("test_in_list_collection")
+        await repository.add_collection_async(
+            collection_name="test_in_list_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[]
+        )
+        await repository.insert(
+            collection="test_in_list_collection",
+            text=["I am a", "I am b", "I am c", "I am d"],
+            data=[{"user_id": "a"}, {"user_id": "b"}, {"user_id": "c"}, {"user_id": "d"}],
+            insert_one=False
+        )
+
+        repeated = await repository.find(
+            collection="test_in_list_collection",
+            filter=Field("user_id").isin(["a", "b", "c", "d", "a"])
+        )
+        empty = await repository.find(
+            collection="test_in_list_collection",
+            filter=Field("user_id").isin([])
+        )
+        retrieved = await repository.retrieval(
+            collection="test_in_list_collection",
+            text="I am a",
+            filter=Field("user_id").isin([]) & (Field("user_id") == "a")
+        )
+        await repository.clear_collections("test_in_list_collection")
+        await repository.aclose()
+        return {
+            "expected": (["a", "b", "c", "d"], [], []),
+            "actual": (sorted(row["user_id"] for row in repeated), empty, retrieved)
+        }
+    
+    @Test("Test #28. Derive Vector Index Parameters")
+    async def test_28(self):
+        return {
+            "expected": [
+                {"nlist": 4000}, {"nlist": 1024}, {"nlist": 1024, "m": 64, "nbits": 8},
+                {"nprobe": 125}, {"nprobe": 32}, {"nprobe": 4}, {"ef": 64}
+            ],
+            "actual": [
+                index_build_params("IVF_FLAT", 768, expected_rows=1000000),
+                index_build_params("IVF_FLAT", 768),
+                index_build_params("IVF_PQ", 768),
+                index_search_params("IVF_FLAT", {"nlist": 4000}),
+                index_search_params("IVF_FLAT", {}),
+                index_search_params("IVF_FLAT", {"nlist": 4}),
+                index_search_params("HNSW", index_build_params("HNSW", 768))
+            ]
+        }
+    
+    @Test("Test #29. Retrieval with Per-Call Search Parameters")
+    async def test_29(self):
+        repository = MilvusRepository(
+            embedding_dimension=768
+        )
+        await repository.clear_collections("test_search_params_collection")
+        await repository.add_collection_async(
+            collection_name="test_search_params_collection",
+            collection_fields=[
+                StringField("user_id"),
+                VectorField("embedding")
+            ],
+            indexes=[],
+            vector_index=VectorIndex(index_type="HNSW")
+        )
+        await repository.insert(collection="test_search_params_collection", text="I love pizza", data={"user_id": "pizza"})
+
+        # Record the search parameters each retrieval sends to Milvus
+        search = Collection.search
+        params = []
+        def recording_search(collection, *args, **kwargs):
+            params.append(kwargs["param"]["params"]["ef"])
+            return search(collection, *args, **kwargs)
+        Collection.search = recording_search
+        try:
+            await repository.retrieval(collection="test_search_params_collection", text="pizza", limit=3)
+            await repository.retrieval(collection="test_search_params_collection", text="pizza", limit=100)
+            await repository.retrieval(collection="test_search_params_collection", text="pizza", limit=3, search_params={"ef": 200})
+            await repository.retrieval(collection="test_search_params_collection", text="pizza", limit=20, search_params={"ef": 10})
+        finally:
+            Collection.search = search
+
+        await repository.clear_collections("test_search_params_collection")
+        await repository.aclose()
+        return {
+            "expected": [64, 100, 200, 20],
+            "actual": params
+        }
+    
+    @Test("Test #30. Shed Reads of a Full Executor Queue but Run Buffered Writes")
+    async def test_30(self):
+        executor = MilvusExecutor(read_workers=1, write_workers=1, max_queue_depth=1)
+        gate = threading.Event()
+
+        # One running and one queued read fill the read pool, writes still run in their own pool
+        reads = [asyncio.ensure_future(executor.run("read", gate.wait, 10)) for _ in range(2)]
+        await asyncio.sleep(0)
+        written = await executor.run("write", lambda: "written")
+
+        writes = [asyncio.ensure_future(executor.run("write", gate.wait, 10)) for _ in range(2)]
+        await asyncio.sleep(0)
+        shed = []
+        for pool in ["read", "write"]:
+            try:
+                await executor.run(pool, lambda: "ran")
+            except ExecutorOverloadedError:
+                shed.append(pool)
+        buffered = asyncio.ensure_future(executor.run("write", lambda: "buffered", shed=False))
+        await asyncio.sleep(0)
+        pending = executor.stats()["write"]["pending"]
+
+        gate.set()
+        await asyncio.gather(*reads, *writes)
+        result = await buffered
+        stats = executor.stats()
+        executor.shutdown()
+        return {
+            "expected": ["written", ["read", "write"], 3, "buffered", {"read": 1, "write": 1}],
+            "actual": [written, shed, pending, result, {pool: stats[pool]["rejected"] for pool in stats}]
+        }
+    
 async def main():
     t = MilvusTest()
     await t.do_test()
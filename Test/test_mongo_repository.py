@@ -8,6 +8,9 @@ from colorama import Fore, init
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Mongo.MongoRepository import MongoRepository
+from Filter.Filter import *
+from Cache.ResultCache import ResultCache
+from Cache.SingleFlight import SingleFlight
 
 # colorama 초기화
 init(autoreset=True)
@@ -75,6 +78,12 @@ class MongoTest:
             self.test_10(),
             self.test_11(),
             self.test_12(),
+            self.test_13(),
+            self.test_14(),
+            self.test_15(),
+            self.test_16(),
+            self.test_17(),
+            self.test_18(),
         ]
         for test in tests:
             await test
@@ -237,6 +246,104 @@ class MongoTest:
             "actual": result
         }
 
+    @Test("Test #13. Delete Data without Returning Deleted Data")
+    async def test_13(self):
+        result = await self.mongo_repository.delete(
+            collection=self.collection_name,
+            filter={"name": "dalmeng3"},
+            return_deleted=False
+        )
+        return {
+            "expected": 1,
+            "actual": result
+        }
+
+    @Test("Test #14. Find Data using Filter Expression")
+    async def test_14(self):
+        result = await self.mongo_repository.find(
+            collection=self.collection_name,
+            filter=(Field("type") == 2) & Field("name").isin(["dalmeng2", "dalmeng9"])
+        )
+        return {
+            "expected": [{"name": "dalmeng2", "type": 2}],
+            "actual": result
+        }
+
+    @Test("Test #15. Find Data with Field Projection")
+    async def test_15(self):
+        result = await self.mongo_repository.find(
+            collection=self.collection_name,
+            filter={"type": 2},
+            fields=["name"]
+        )
+        return {
+            "expected": [{"name": "dalmeng1"}, {"name": "dalmeng2"}],
+            "actual": sorted(result, key=lambda x: x["name"])
+        }
+
+    @Test("Test #16. Result Cache Invalidated by Insert and Delete")
+    async def test_16(self):
+        result_cache = ResultCache(max_entries=16, ttl_seconds=60)
+        mongo_repository = MongoRepository(
+            username="test_username",
+            password="test_password",
+            table="test_table",
+            result_cache=result_cache
+        )
+        first = await mongo_repository.find(collection=self.collection_name, filter={"type": 9})
+        first.append({"name": "mutated"})
+        second = await mongo_repository.find(collection=self.collection_name, filter={"type": 9})
+        await mongo_repository.insert(collection=self.collection_name, data={"name": "dalmeng9", "type": 9})
+        third = await mongo_repository.find(collection=self.collection_name, filter={"type": 9})
+        await mongo_repository.delete(collection=self.collection_name, filter={"name": "dalmeng9"}, return_deleted=False)
+        fourth = await mongo_repository.find(collection=self.collection_name, filter={"type": 9})
+        stats = result_cache.stats()
+        return {
+            "expected": [[], [{"name": "dalmeng9", "type": 9}], [], 1, 3],
+            "actual": [second, third, fourth, stats["hits"], stats["misses"]]
+        }
+
+    @Test("Test #17. Identical Concurrent Finds Share One Query")
+    async def test_17(self):
+        single_flight = SingleFlight()
+        mongo_repository = MongoRepository(
+            username="test_username",
+            password="test_password",
+            table="test_table",
+            single_flight=single_flight
+        )
+        await mongo_repository.insert(collection=self.collection_name, data={"name": "dalmeng9", "type": 9})
+        results = await asyncio.gather(*[
+            mongo_repository.find(collection=self.collection_name, filter={"type": 9})
+            for _ in range(8)
+        ])
+        results[0][0]["name"] = "mutated"
+        await mongo_repository.delete(collection=self.collection_name, filter={"type": 9}, return_deleted=False)
+        return {
+            "expected": [[[{"name": "dalmeng9", "type": 9}]] * 7, {"calls": 1, "shared": 7}],
+            "actual": [results[1:], {"calls": single_flight.calls, "shared": single_flight.shared}]
+        }
+
+    @Test("Test #18. Partial Upsert and Update")
+    async def test_18(self):
+        upserted = await self.mongo_repository.upsert(
+            collection=self.collection_name,
+            filter={"name": "dalmeng8"},
+            data={"type": 8},
+            partial=True
+        )
+        updated = await self.mongo_repository.update(
+            collection=self.collection_name,
+            filter={"name": "dalmeng8"},
+            data={"tag": "partial"},
+            partial=True
+        )
+        await self.mongo_repository.delete(collection=self.collection_name, filter={"name": "dalmeng8"}, return_deleted=False)
+        return {
+            "expected": [{"name": "dalmeng8", "type": 8}, {"name": "dalmeng8", "type": 8, "tag": "partial"}],
+            "actual": [upserted, updated]
+        }
+
 async def main():
     t = MongoTest()
     await t.do_test()